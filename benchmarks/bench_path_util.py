@@ -0,0 +1,67 @@
+"""
+Compare the batch `path_util` functions against calling the scalar ones in a loop.
+
+Run with `python benchmarks/bench_path_util.py`
+"""
+
+import datetime
+import time
+import timeit
+
+from msu_ssc import path_util
+
+
+def _rate(function, count: int) -> float:
+    elapsed = min(timeit.repeat(function, number=1, repeat=5))
+    return count / elapsed
+
+
+def main(count: int = 100_000) -> None:
+    start = datetime.datetime(2025, 1, 2, tzinfo=datetime.timezone.utc)
+    # One file every 10 ms, like a high-rate capture
+    datetimes = [start + datetime.timedelta(milliseconds=10 * index) for index in range(count)]
+    start_ns = time.time_ns()
+    epoch_ns = [start_ns + 10_000_000 * index for index in range(count)]
+    parts = [f"antenna {index % 20}" for index in range(count)]
+
+    comparisons = {
+        "file_timestamp(datetime)": (
+            lambda: [path_util.file_timestamp(timestamp, timespec="milliseconds") for timestamp in datetimes],
+            lambda: path_util.file_timestamps(datetimes, timespec="milliseconds"),
+        ),
+        "file_timestamp(epoch ns)": (
+            lambda: [
+                path_util.file_timestamp(
+                    datetime.datetime.fromtimestamp(ns / 1e9, tz=datetime.timezone.utc), timespec="milliseconds"
+                )
+                for ns in epoch_ns
+            ],
+            lambda: path_util.file_timestamps(epoch_ns, timespec="milliseconds"),
+        ),
+        "clean_path_part": (
+            lambda: [path_util._chunk_regex.sub("_", part) for part in parts],
+            lambda: path_util.clean_path_parts(parts),
+        ),
+    }
+    try:
+        import numpy as np
+
+        array = np.array([timestamp.replace(tzinfo=None) for timestamp in datetimes], dtype="datetime64[ns]")
+        comparisons["file_timestamp(datetime64)"] = (
+            comparisons["file_timestamp(datetime)"][0],
+            lambda: path_util.file_timestamps(array, timespec="milliseconds"),
+        )
+    except ImportError:
+        pass
+
+    for name, (scalar, batch) in comparisons.items():
+        scalar_rate = _rate(scalar, count)
+        batch_rate = _rate(batch, count)
+        print(
+            f"{name:<28} scalar: {scalar_rate:>12,.0f}/sec   batch: {batch_rate:>12,.0f}/sec   "
+            + f"({batch_rate / scalar_rate:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare records/sec of the `ssc_log` formatters against the ones they replace.
+
+Run with `python benchmarks/bench_ssc_log_formatters.py`
+"""
+
+import logging
+import time
+import timeit
+import warnings
+from typing import List
+
+from msu_ssc import ssc_log
+
+
+def _make_records(count: int, records_per_second: float) -> List[logging.LogRecord]:
+    records = []
+    start = time.time()
+    for index in range(count):
+        record = logging.LogRecord(
+            "ssc.udp_mux",
+            logging.DEBUG,
+            __file__,
+            42,
+            "Received %s bytes from %s",
+            (1234, "127.0.0.1:8001"),
+            None,
+            func="handle_packet",
+        )
+        # Spread the records out in time, so the formatters' per-second caches roll over like they would for real
+        record.created = start + index / records_per_second
+        record.msecs = (record.created - int(record.created)) * 1000
+        records.append(record)
+    return records
+
+
+def _records_per_second(format_function, records: List[logging.LogRecord]) -> float:
+    def format_all() -> None:
+        for record in records:
+            format_function(record)
+
+    elapsed = min(timeit.repeat(format_all, number=1, repeat=5))
+    return len(records) / elapsed
+
+
+def main(number: int = 50_000) -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from pythonjsonlogger.jsonlogger import JsonFormatter
+
+    comparisons = {
+        "plain text": (
+            logging.Formatter(fmt=ssc_log.PlainTextFormatter.FORMAT, datefmt=ssc_log.PlainTextFormatter.DATEFMT).format,
+            ssc_log.PlainTextFormatter().format,
+        ),
+        "jsonl": (
+            JsonFormatter(reserved_attrs=("msg", "args", "levelno")).format,
+            ssc_log.JsonLinesFormatter().format,
+        ),
+    }
+    # From a busy mux (a new second every 1,000 records) down to the worst case for the caches (every record)
+    for records_per_second in (1000, 10, 1):
+        records = _make_records(number, records_per_second)
+        print(f"{records_per_second:,} records per logged second:")
+        for name, (old_format, new_format) in comparisons.items():
+            old_rate = _records_per_second(old_format, records)
+            new_rate = _records_per_second(new_format, records)
+            print(
+                f"  {name:<12} old: {old_rate:>12,.0f} records/sec   new: {new_rate:>12,.0f} records/sec   "
+                + f"({new_rate / old_rate:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
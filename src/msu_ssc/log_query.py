@@ -0,0 +1,385 @@
+"""
+Search many `ssc_log` files at once, filtering by level, logger, UTC time range and message regex.
+
+Handles plain text (`.log`, `.txt`), JSONL (`.jsonl`) and binary (`.sscb`) logs, including segments compressed by
+`RotatingUtcFileHandler` (`.gz`, `.xz`). Files are searched in parallel across a process pool, and the matches from
+all files are merged in timestamp order.
+
+Uncompressed text files are read through `mmap`, so memory use doesn't grow with file size, and a UTC start time
+is found by binary search rather than by reading the whole file. Matches are spooled to temporary files by the
+workers and streamed back, so they aren't held in memory either.
+
+From the command line:
+
+```
+python -m msu_ssc.log_query logs/ --level WARNING --start 2025-02-03T12:00:00 --grep "timeout|refused"
+```
+"""
+
+import datetime
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+from typing import Union
+
+from msu_ssc import time_util
+
+_PLAIN_TEXT_LINE = re.compile(rb"\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\.(\d{3}) (\w+) *\] ")
+
+_SLACK_SECONDS = 1.0
+"""Records from different threads can be written slightly out of time order. Search this far past the limits."""
+
+_BISECT_MIN_BYTES = 64 * 1024
+
+LOG_SUFFIXES = (".log", ".txt", ".jsonl", ".sscb")
+COMPRESSED_SUFFIXES = (".gz", ".xz")
+
+
+class LogQuery(NamedTuple):
+    """What to search for. `None` means no restriction."""
+
+    min_levelno: int = logging.NOTSET
+    logger: Union[str, None] = None
+    """Logger name. Matches this logger and its children. Plain text logs don't record the logger, so never match."""
+    start: Union[float, None] = None
+    """POSIX timestamp. Inclusive."""
+    end: Union[float, None] = None
+    """POSIX timestamp. Exclusive."""
+    pattern: Union[str, None] = None
+    """Regular expression, searched for in the message."""
+
+
+class QueryMatch(NamedTuple):
+    created: float
+    levelname: str
+    name: Union[str, None]
+    message: str
+    path: str
+    line_number: int
+    """1-based line number in the file, or record number for binary logs. `0` if the part of the file before a
+    `start` time was skipped, so the line number is unknown."""
+    text: str
+    """The record as it appears in the file (or as JSON, for binary logs)."""
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """UTC time of the record, as a timezone-aware `datetime`."""
+        return datetime.datetime.fromtimestamp(self.created, tz=datetime.timezone.utc)
+
+
+class _Matcher:
+    def __init__(self, query: LogQuery) -> None:
+        self.query = query
+        self.regex = re.compile(query.pattern) if query.pattern else None
+        self._levelnos = {}
+
+    def levelno(self, levelname: str) -> int:
+        try:
+            return self._levelnos[levelname]
+        except KeyError:
+            levelno = logging.getLevelName(levelname)
+            levelno = self._levelnos[levelname] = levelno if isinstance(levelno, int) else logging.NOTSET
+            return levelno
+
+    def past_end(self, created: float) -> bool:
+        return self.query.end is not None and created >= self.query.end + _SLACK_SECONDS
+
+    def matches(self, created: float, levelname: str, name: Union[str, None], message: str) -> bool:
+        query = self.query
+        if query.start is not None and created < query.start:
+            return False
+        if query.end is not None and created >= query.end:
+            return False
+        if query.min_levelno and self.levelno(levelname) < query.min_levelno:
+            return False
+        if query.logger is not None and not (
+            name is not None and (name == query.logger or name.startswith(query.logger + "."))
+        ):
+            return False
+        if self.regex is not None and not self.regex.search(message):
+            return False
+        return True
+
+
+def _log_kind(path: Path) -> str:
+    suffixes = path.suffixes
+    if suffixes and suffixes[-1] in COMPRESSED_SUFFIXES:
+        suffixes = suffixes[:-1]
+    suffix = suffixes[-1] if suffixes else ""
+    if suffix == ".jsonl":
+        return "jsonl"
+    if suffix == ".sscb":
+        return "binary"
+    return "plain"
+
+
+def _open_lines(path: Path, start: Union[float, None], parse_time) -> Iterator[Tuple[int, bytes]]:
+    """Yield `(line_number, line)` from the file. Line numbers are `0` if a start time was found by binary search."""
+    if path.suffix in COMPRESSED_SUFFIXES:
+        import gzip
+        import lzma
+
+        opener = gzip.open if path.suffix == ".gz" else lzma.open
+        with opener(path, "rb") as file:
+            yield from enumerate(file, start=1)
+        return
+
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            offset = 0
+            if start is not None:
+                offset = _bisect_start(mapped, start - _SLACK_SECONDS, parse_time)
+            mapped.seek(offset)
+            readline = mapped.readline
+            line_number = 1 if offset == 0 else 0
+            for line in iter(readline, b""):
+                yield line_number, line
+                if line_number:
+                    line_number += 1
+
+
+def _bisect_start(mapped: mmap.mmap, start: float, parse_time) -> int:
+    """Offset of a line start at or before the first record at or after `start`, assuming the file is in time order."""
+    low, high = 0, len(mapped)
+    while high - low > _BISECT_MIN_BYTES:
+        middle = (low + high) // 2
+        line_start = mapped.find(b"\n", middle, high)
+        if line_start < 0:
+            break
+        line_start += 1
+        created = None
+        position = line_start
+        # Skip continuation lines (e.g., tracebacks) until a line with a timestamp
+        while created is None and position < high:
+            line_end = mapped.find(b"\n", position, high)
+            if line_end < 0:
+                line_end = high
+            created = parse_time(mapped[position:line_end])
+            position = line_end + 1
+        if created is None or created >= start:
+            high = middle
+        else:
+            low = line_start
+    return low
+
+
+class _PlainTextTimes:
+    """Parse the local-time timestamp at the start of a plain text line, caching the last second parsed."""
+
+    def __init__(self) -> None:
+        self._last = (b"", 0.0)
+
+    def parse(self, line: bytes) -> Union[float, None]:
+        match = _PLAIN_TEXT_LINE.match(line)
+        if not match:
+            return None
+        return self.seconds(match.group(1)) + int(match.group(2)) / 1000
+
+    def seconds(self, seconds_string: bytes) -> float:
+        last_string, last_seconds = self._last
+        if seconds_string != last_string:
+            last_seconds = time.mktime(time.strptime(seconds_string.decode("ascii"), "%Y-%m-%d %H:%M:%S"))
+            self._last = (seconds_string, last_seconds)
+        return last_seconds
+
+
+def _query_plain_text(path: Path, matcher: _Matcher) -> Iterator[QueryMatch]:
+    times = _PlainTextTimes()
+    pending: Union[List, None] = None
+
+    def finish(pending) -> Union[QueryMatch, None]:
+        created, levelname, line_number, lines = pending
+        text = b"".join(lines).decode("utf-8", errors="replace").rstrip("\n")
+        message = text[text.index("] ") + 2 :]
+        if matcher.matches(created, levelname, None, message):
+            return QueryMatch(created, levelname, None, message, str(path), line_number, text)
+        return None
+
+    for line_number, line in _open_lines(path, matcher.query.start, times.parse):
+        match = _PLAIN_TEXT_LINE.match(line)
+        if match is None:
+            # Continuation of a multi-line record
+            if pending is not None:
+                pending[3].append(line)
+            continue
+
+        if pending is not None:
+            result = finish(pending)
+            if result is not None:
+                yield result
+        created = times.seconds(match.group(1)) + int(match.group(2)) / 1000
+        if matcher.past_end(created):
+            return
+        pending = [created, match.group(3).decode("ascii"), line_number, [line]]
+
+    if pending is not None:
+        result = finish(pending)
+        if result is not None:
+            yield result
+
+
+def _jsonl_time(line: bytes) -> Union[float, None]:
+    try:
+        return float(json.loads(line)["created"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _query_jsonl(path: Path, matcher: _Matcher) -> Iterator[QueryMatch]:
+    for line_number, line in _open_lines(path, matcher.query.start, _jsonl_time):
+        try:
+            data = json.loads(line)
+            created = float(data["created"])
+        except (ValueError, KeyError, TypeError):
+            continue
+        if matcher.past_end(created):
+            return
+        levelname = data.get("levelname", "")
+        name = data.get("name")
+        message = data.get("message", "")
+        if matcher.matches(created, levelname, name, message):
+            text = line.decode("utf-8", errors="replace").rstrip("\n")
+            yield QueryMatch(created, levelname, name, message, str(path), line_number, text)
+
+
+def _query_binary(path: Path, matcher: _Matcher) -> Iterator[QueryMatch]:
+    from msu_ssc.ssc_log_binary import read_records
+
+    query = matcher.query
+    for record_number, record in enumerate(read_records(path, start=query.start, end=query.end), start=1):
+        if matcher.matches(record.created, record.levelname, record.name, record.message):
+            yield QueryMatch(
+                record.created,
+                record.levelname,
+                record.name,
+                record.message,
+                str(path),
+                record_number,
+                json.dumps(record.to_dict()),
+            )
+
+
+def query_file(path: Union[Path, str], query: LogQuery) -> Iterator[QueryMatch]:
+    """Yield the records in one log file that match `query`, in file order."""
+    path = Path(path)
+    matcher = _Matcher(query)
+    kind = _log_kind(path)
+    if kind == "jsonl":
+        return _query_jsonl(path, matcher)
+    if kind == "binary":
+        return _query_binary(path, matcher)
+    return _query_plain_text(path, matcher)
+
+
+def _spool_file(path: str, query: LogQuery, spool_directory: str) -> Tuple[str, int]:
+    """Process pool worker: write the matches in one file to a temporary file, one JSON array per line."""
+    descriptor, spool_path = tempfile.mkstemp(prefix="ssc_query_", suffix=".jsonl", dir=spool_directory)
+    count = 0
+    with open(descriptor, "w", encoding="utf-8") as spool:
+        for match in query_file(path, query):
+            spool.write(json.dumps(match) + "\n")
+            count += 1
+    return spool_path, count
+
+
+def _read_spool(spool_path: str) -> Iterator[QueryMatch]:
+    with open(spool_path, encoding="utf-8") as spool:
+        for line in spool:
+            yield QueryMatch(*json.loads(line))
+
+
+def find_log_files(paths: Iterable[Union[Path, str]]) -> List[Path]:
+    """Expand directories into the log files they contain (recursively). Files are returned as given."""
+    found = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if not child.is_file():
+                    continue
+                suffixes = child.suffixes
+                if suffixes and suffixes[-1] in COMPRESSED_SUFFIXES:
+                    suffixes = suffixes[:-1]
+                if suffixes and suffixes[-1] in LOG_SUFFIXES:
+                    found.append(child)
+        else:
+            found.append(path)
+    return found
+
+
+def query_files(
+    paths: Iterable[Union[Path, str]],
+    query: LogQuery,
+    *,
+    processes: Union[int, None] = None,
+) -> Iterator[QueryMatch]:
+    """Yield the records matching `query` in all of the given files and directories, merged in timestamp order.
+
+    Each file is assumed to be (roughly) in time order, as written by `ssc_log`. Files are searched in a
+    `ProcessPoolExecutor` with `processes` workers (default: one per CPU). With `processes=1`, or a single file,
+    everything happens in this process.
+    """
+    files = find_log_files(paths)
+    if processes == 1 or len(files) <= 1:
+        yield from heapq.merge(*(query_file(path, query) for path in files), key=lambda match: match.created)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with tempfile.TemporaryDirectory(prefix="ssc_query_") as spool_directory:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_spool_file, str(path), query, spool_directory) for path in files]
+            spool_paths = [future.result()[0] for future in futures]
+        yield from heapq.merge(*(_read_spool(path) for path in spool_paths), key=lambda match: match.created)
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search ssc_log plain text, JSONL and binary log files")
+    parser.add_argument("paths", nargs="+", help="Log files, or directories to search for log files")
+    parser.add_argument(
+        "--level",
+        "-L",
+        choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+        help="Minimum level",
+    )
+    parser.add_argument("--logger", help="Logger name. Also matches its children")
+    parser.add_argument("--start", type=time_util.parse_utc, help="ISO 8601 time. Naive times are taken as UTC")
+    parser.add_argument("--end", type=time_util.parse_utc, help="ISO 8601 time. Naive times are taken as UTC")
+    parser.add_argument("--grep", "-e", help="Regular expression to search for in the message")
+    parser.add_argument("--processes", "-j", type=int, default=None, help="Worker processes. Default: one per CPU")
+    parser.add_argument("--with-filename", "-H", action="store_true", help="Prefix each match with file:line")
+    args = parser.parse_args()
+
+    query = LogQuery(
+        min_levelno=logging.getLevelName(args.level) if args.level else logging.NOTSET,
+        logger=args.logger,
+        start=args.start.timestamp() if args.start else None,
+        end=args.end.timestamp() if args.end else None,
+        pattern=args.grep,
+    )
+    for match in query_files(args.paths, query, processes=args.processes):
+        if args.with_filename:
+            sys.stdout.write(f"{match.path}:{match.line_number}: {match.text}\n")
+        else:
+            sys.stdout.write(match.text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
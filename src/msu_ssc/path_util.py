@@ -1,7 +1,12 @@
 import datetime
+import functools
 import re
+import string
 import sys
 from pathlib import Path
+from typing import Iterable
+from typing import List
+from typing import Tuple
 from typing import Union
 
 if sys.version_info >= (3, 8):
@@ -12,10 +17,28 @@ else:
     TimespecType = str
 
 _chunk_regex = re.compile(r"[^a-zA-Z0-9\-_\.]+")
+_clean_characters = frozenset(string.ascii_letters + string.digits + "-_.")
 
 
+def _clean_path_part(part: str) -> str:
+    # Most parts are already clean, and checking that is much cheaper than a regex substitution
+    if _clean_characters.issuperset(part):
+        return part
+    return _chunk_regex.sub("_", part)
+
+
+@functools.lru_cache(maxsize=4096)
 def clean_path_part(part: str) -> str:
-    return re.sub(_chunk_regex, "_", part)
+    """Replace each run of characters other than ASCII letters, digits, `-`, `_` and `.` with a single `_`.
+
+    Results are cached, since the same parts (directory names, prefixes, extensions) tend to come up over and over.
+    """
+    return _clean_path_part(part)
+
+
+def clean_path_parts(parts: Iterable[str]) -> List[str]:
+    """`clean_path_part()` for many parts at once."""
+    return [clean_path_part(part) for part in parts]
 
 
 def _is_valid_path_chunk(chunk: str) -> bool:
@@ -76,7 +99,318 @@ def file_timestamp(
     # to avoid the "+00:00" in the string
     timestamp = timestamp.astimezone(desired_tz).replace(tzinfo=None)
 
-    return clean_path_part(timestamp.isoformat(sep=sep, timespec=timespec))
+    # Not `clean_path_part()`, since timestamps are rarely repeated and would just churn its cache
+    return _clean_path_part(timestamp.isoformat(sep=sep, timespec=timespec))
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+_SECOND_TIMESPECS = {
+    "auto": "seconds",
+    "hours": "hours",
+    "minutes": "minutes",
+    "seconds": "seconds",
+    "milliseconds": "seconds",
+    "microseconds": "seconds",
+}
+
+
+def _epoch_microseconds(
+    timestamp: Union[datetime.datetime, int],
+    assume_utc: bool,
+    assume_local: bool,
+) -> int:
+    if not isinstance(timestamp, datetime.datetime):
+        # Epoch nanoseconds (`int`, or something like `numpy.int64`)
+        return int(timestamp) // 1000
+    if timestamp.tzinfo is None:
+        if assume_utc and assume_local:
+            raise ValueError("Cannot assume both UTC and local time")
+        elif assume_utc:
+            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+        elif assume_local:
+            timestamp = timestamp.astimezone(datetime.timezone.utc)
+        else:
+            raise ValueError("Must assume either UTC or local time if timestamp is naive")
+    return (timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None) - _EPOCH) // _ONE_MICROSECOND
+
+
+def _epoch_nanoseconds(timestamp: Union[datetime.datetime, int]) -> int:
+    if isinstance(timestamp, datetime.datetime):
+        return _epoch_microseconds(timestamp, False, False) * 1000
+    return int(timestamp)
+
+
+def file_timestamps(
+    timestamps: Iterable[Union[datetime.datetime, int]],
+    *,
+    sep="T",
+    timespec: TimespecType = "seconds",
+    assume_utc=False,
+    assume_local=False,
+) -> List[str]:
+    """`file_timestamp()` for many timestamps at once, always in UTC.
+
+    Each timestamp can be a `datetime` (with the same rules for naive ones as `file_timestamp()`), or an `int` of
+    nanoseconds since the POSIX epoch (like `time.time_ns()`), which is truncated to microseconds.
+
+    A NumPy `datetime64` array, or integer array of epoch nanoseconds, is also accepted, and formatted without a
+    Python loop. Like everything in NumPy, its values are taken to be UTC.
+
+    The date and time part of the string is only rendered once per second, so this is much faster than calling
+    `file_timestamp()` for each timestamp when they are close together.
+    """
+    if type(timestamps).__module__ == "numpy":
+        kind = timestamps.dtype.kind
+        if kind == "M":
+            return _file_timestamps_numpy(timestamps, sep=sep, timespec=timespec)
+        if kind in "iu":
+            # Epoch nanoseconds, like the `int`s below
+            return _file_timestamps_numpy(timestamps.astype("datetime64[ns]"), sep=sep, timespec=timespec)
+        # Anything else (e.g., an object array of `datetime`s) goes through the loop below
+
+    seconds_timespec = _SECOND_TIMESPECS[timespec]
+    clean_sep = _clean_path_part(sep)
+    results = []
+    last_second = None
+    prefix = ""
+    for timestamp in timestamps:
+        microseconds = _epoch_microseconds(timestamp, assume_utc, assume_local)
+        second, fraction = divmod(microseconds, 1_000_000)
+        if second != last_second:
+            last_second = second
+            moment = _EPOCH + datetime.timedelta(seconds=second)
+            prefix = moment.isoformat(sep="T", timespec=seconds_timespec).replace(":", "_").replace("T", clean_sep, 1)
+        if timespec == "milliseconds":
+            results.append(f"{prefix}.{fraction // 1000:03d}")
+        elif timespec == "microseconds" or (timespec == "auto" and fraction):
+            results.append(f"{prefix}.{fraction:06d}")
+        else:
+            results.append(prefix)
+    return results
+
+
+_NUMPY_UNITS = {
+    "hours": "h",
+    "minutes": "m",
+    "seconds": "s",
+    "milliseconds": "ms",
+    "microseconds": "us",
+}
+
+
+def _file_timestamps_numpy(timestamps, *, sep: str, timespec: TimespecType) -> List[str]:
+    import numpy as np
+
+    microseconds = np.asarray(timestamps).astype("datetime64[us]")
+    if timespec == "auto":
+        with_fraction = np.datetime_as_string(microseconds, unit="us")
+        without_fraction = np.datetime_as_string(microseconds, unit="s")
+        has_fraction = (microseconds.astype(np.int64) % 1_000_000) != 0
+        strings = np.where(has_fraction, with_fraction, without_fraction)
+    else:
+        strings = np.datetime_as_string(microseconds, unit=_NUMPY_UNITS[timespec])
+    strings = np.char.replace(strings, ":", "_")
+    clean_sep = _clean_path_part(sep)
+    if clean_sep != "T":
+        strings = np.char.replace(strings, "T", clean_sep, count=1)
+    return strings.tolist()
+
+
+def _layout_step_seconds(layout: str) -> int:
+    """How long every partition made by the `strftime()` pattern `layout` covers, in seconds: 1, 60, 3600 or a day.
+
+    Found by formatting probe times, so any directive works (`%I%p`, `%T`, `%s`, ...). Month or year partitions
+    aren't a fixed length, but they are constant within a day.
+    """
+    day = datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def changes(first: int, second: int) -> bool:
+        return (day + datetime.timedelta(seconds=first)).strftime(layout) != (
+            day + datetime.timedelta(seconds=second)
+        ).strftime(layout)
+
+    if changes(30, 31):
+        return 1
+    if changes(30 * 60, 31 * 60):
+        return 60
+    # Every hour, since some directives change only at noon (`%p`)
+    if any(changes(hour * 60 * 60, (hour + 1) * 60 * 60) for hour in range(23)):
+        return 60 * 60
+    return 24 * 60 * 60
+
+
+class PartitionedDirectory:
+    """
+    A directory of files sharded into subdirectories by UTC time, like `root/2025/002/03/<file>`.
+
+    Flat directories of one file per minute (or per pass) get slow to list and clean up. This keeps each directory
+    small, and keeps a small index file in each partition so that `find()` can list the files for a time range without
+    walking the whole tree.
+
+    - `layout` is a `strftime()` pattern for the partition, relative to `root`. The default is year/day-of-year/hour.
+      Every component is passed through `clean_path_part()`.
+    - Timestamps are timezone-aware `datetime`s or `int` nanoseconds since the POSIX epoch (like `time.time_ns()`).
+    - Partition directories that have been created (or seen to exist) are remembered, so writing many files into the
+      same partition costs no `mkdir()`/`stat()` calls after the first. A remembered partition that has since been
+      deleted is created again when its index is next opened, and `close()` forgets them all.
+
+    Each index line is `<epoch nanoseconds>\t<file name>`. Index entries are appended in the order `path()` is called,
+    so `find()` sorts them.
+    """
+
+    def __init__(
+        self,
+        root: Union[Path, str],
+        *,
+        layout: str = "%Y/%j/%H",
+        prefix: str = "",
+        suffix: str = "",
+        sep: str = "T",
+        timespec: TimespecType = "seconds",
+        index_name: str = "_index.tsv",
+    ) -> None:
+        self.root = Path(root).expanduser()
+        self.layout = layout
+        self.prefix = prefix
+        self.suffix = suffix
+        self.sep = sep
+        self.timespec = timespec
+        self.index_name = index_name
+        self._step_seconds = _layout_step_seconds(layout)
+        self._existing_directories = set()
+        self._partition_cache_key = None
+        self._partition_cache: Union[Path, None] = None
+        self._index_directory: Union[Path, None] = None
+        self._index_stream = None
+
+    def _partition_for_second(self, second: int) -> Path:
+        key = second // self._step_seconds
+        if key != self._partition_cache_key:
+            moment = _EPOCH + datetime.timedelta(seconds=second)
+            parts = moment.strftime(self.layout).split("/")
+            self._partition_cache = self.root.joinpath(*(clean_path_part(part) for part in parts))
+            self._partition_cache_key = key
+        return self._partition_cache
+
+    def partition(self, timestamp: Union[datetime.datetime, int]) -> Path:
+        """The partition directory for `timestamp`. Does not create it."""
+        return self._partition_for_second(_epoch_nanoseconds(timestamp) // 1_000_000_000)
+
+    def ensure_directory(self, directory: Path) -> Path:
+        """Create `directory` (and its parents) unless it is already known to exist."""
+        if directory not in self._existing_directories:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._existing_directories.add(directory)
+        return directory
+
+    def path(
+        self,
+        timestamp: Union[datetime.datetime, int, None] = None,
+        *,
+        suffix: Union[str, None] = None,
+        index: bool = True,
+    ) -> Path:
+        """
+        The path for a new file stamped with `timestamp` (default: now), in its partition.
+
+        The partition directory is created if needed, and unless `index=False` the file is added to the partition's
+        index. The file itself is not created.
+        """
+        if timestamp is None:
+            timestamp = datetime.datetime.now(tz=datetime.timezone.utc)
+        nanoseconds = _epoch_nanoseconds(timestamp)
+        directory = self.ensure_directory(self._partition_for_second(nanoseconds // 1_000_000_000))
+        stamp = file_timestamps([nanoseconds], sep=self.sep, timespec=self.timespec)[0]
+        name = clean_path_part(f"{self.prefix}{stamp}{self.suffix if suffix is None else suffix}")
+        if index:
+            try:
+                self._append_index(directory, nanoseconds, name)
+            except FileNotFoundError:
+                # The partition was deleted after it was remembered, e.g. by a cleanup job
+                self._existing_directories.discard(directory)
+                self.ensure_directory(directory)
+                self._append_index(directory, nanoseconds, name)
+        return directory / name
+
+    def _append_index(self, directory: Path, nanoseconds: int, name: str) -> None:
+        # Files are almost always added to the newest partition, so keep just its index open
+        if directory != self._index_directory:
+            self._close_index()
+            self._index_stream = open(directory / self.index_name, "a", encoding="utf-8")
+            self._index_directory = directory
+        self._index_stream.write(f"{nanoseconds}\t{name}\n")
+        self._index_stream.flush()
+
+    def close(self) -> None:
+        """Close the open index file, if any, and forget which partitions exist. The directory can still be used
+        afterwards."""
+        self._close_index()
+        self._existing_directories.clear()
+
+    def _close_index(self) -> None:
+        if self._index_stream is not None:
+            self._index_stream.close()
+        self._index_stream = None
+        self._index_directory = None
+
+    def __enter__(self) -> "PartitionedDirectory":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def partitions(
+        self,
+        start: Union[datetime.datetime, int],
+        end: Union[datetime.datetime, int],
+    ) -> List[Path]:
+        """The existing partition directories that could hold files stamped from `start` to `end` (inclusive)."""
+        first = _epoch_nanoseconds(start) // 1_000_000_000
+        last = _epoch_nanoseconds(end) // 1_000_000_000
+        results = []
+        second = first - first % self._step_seconds
+        while second <= last:
+            directory = self._partition_for_second(second)
+            if (not results or results[-1] != directory) and (
+                directory in self._existing_directories or directory.is_dir()
+            ):
+                results.append(directory)
+            second += self._step_seconds
+        return results
+
+    def read_index(self, directory: Path) -> List[Tuple[int, Path]]:
+        """The `(epoch nanoseconds, path)` entries of the index in partition `directory`, sorted by time."""
+        if directory == self._index_directory:
+            self._index_stream.flush()
+        try:
+            with open(directory / self.index_name, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            nanoseconds, _, name = line.partition("\t")
+            if name:
+                entries.append((int(nanoseconds), directory / name))
+        entries.sort()
+        return entries
+
+    def find(
+        self,
+        start: Union[datetime.datetime, int],
+        end: Union[datetime.datetime, int],
+    ) -> List[Path]:
+        """The indexed files stamped from `start` to `end` (inclusive), oldest first. Only the partitions in the range
+        are read."""
+        start_ns = _epoch_nanoseconds(start)
+        end_ns = _epoch_nanoseconds(end)
+        results = []
+        for directory in self.partitions(start, end):
+            results.extend(
+                path for nanoseconds, path in self.read_index(directory) if start_ns <= nanoseconds <= end_ns
+            )
+        return results
 
 
 if __name__ == "__main__":
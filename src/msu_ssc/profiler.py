@@ -0,0 +1,301 @@
+"""
+A sampling profiler that can be switched on and off while a mux or proxy is running.
+
+When it is on, a background thread looks at the stack of every (selected) thread every `interval` seconds, for up to
+`duration` seconds, and then writes the counts in the "collapsed stack" format that flame graph tools read:
+
+```
+udp-mux-0.0.0.0:8000;run (threading.py:982);start_mux (udp_mux.py:65);handle_packet (udp_mux.py:118) 412
+```
+
+When it is off there is no sampling thread and nothing is hooked into the interpreter, so it costs nothing.
+
+It can be switched on and off from outside the process by a signal (`install_signal_handler()`, `SIGUSR1` by default)
+or by a UDP control socket (`serve_control_socket()`), or both (`enable_profiler_control()`, which is what
+`python -m msu_ssc.udp_mux ... --profiler-port 47000` does). The command line can talk to the control socket:
+
+```
+python -m msu_ssc.profiler start --port 47000 --duration 30
+python -m msu_ssc.profiler stop --port 47000
+```
+
+Render the output with, e.g., `flamegraph.pl profile_2025-02-03T12_34_56.789.collapsed > profile.svg`, or load it
+into speedscope.
+"""
+
+import collections
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+from typing import Iterable
+from typing import Tuple
+from typing import Union
+
+from msu_ssc import ssc_log
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of running threads, and writes them to a collapsed-stack file.
+
+    Args:
+        directory: Where to write profiles. Default is `ssc_log.DEFAULT_LOG_DIRECTORY`.
+        interval: Seconds between samples.
+        duration: Default length of a profiling window, in seconds, after which the profile is written and
+            sampling stops by itself. `None` to sample until `stop()`.
+        thread_name_prefixes: Only sample threads whose name starts with one of these, such as
+            `MUX_PROXY_THREAD_PREFIXES`. Default is every thread.
+        prefix: The start of each profile's file name.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: Union[Path, str, None] = None,
+        interval: float = 0.005,
+        duration: Union[float, None] = 30.0,
+        thread_name_prefixes: Union[Iterable[str], None] = None,
+        prefix: str = "profile",
+    ) -> None:
+        self.directory = Path(directory).expanduser() if directory is not None else None
+        self.interval = interval
+        self.duration = duration
+        self.thread_name_prefixes = tuple(thread_name_prefixes) if thread_name_prefixes else None
+        self.prefix = prefix
+        self.last_path: Union[Path, None] = None
+        self._lock = threading.Lock()
+        self._thread: Union[threading.Thread, None] = None
+        self._stop_event = threading.Event()
+        self._labels: Dict[object, str] = {}
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def start(self, duration: Union[float, None] = None) -> bool:
+        """Start sampling for `duration` seconds (default: `self.duration`). Returns `False` if already running.
+
+        Not safe to call from a signal handler, since it takes locks. `install_signal_handler()` hands the signal off
+        to a thread instead.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            duration = self.duration if duration is None else duration
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(
+                name="sampling-profiler",
+                daemon=True,
+                target=self._run,
+                args=(self._stop_event, duration),
+            )
+            self._thread.start()
+            return True
+
+    def stop(self, wait: bool = True) -> Union[Path, None]:
+        """Stop sampling early. The profile is written by the sampling thread as it exits.
+
+        Returns:
+            Path | None: If `wait`, the profile written (`None` if there were no samples). `None` if not `wait`, or if
+                it wasn't running.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return None
+            self._stop_event.set()
+        if not wait:
+            return None
+        thread.join()
+        return self.last_path
+
+    def toggle(self) -> bool:
+        """Start if stopped, or stop (without waiting) if running. Returns whether it is now running."""
+        if self.running:
+            self.stop(wait=False)
+            return False
+        return self.start()
+
+    def _label(self, code) -> str:
+        try:
+            return self._labels[code]
+        except KeyError:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label.replace(";", ":")
+            return self._labels[code]
+
+    def sample(self, counts: collections.Counter, exclude: Iterable[int] = ()) -> None:
+        """Add one sample of every selected thread's stack to `counts`."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        prefixes = self.thread_name_prefixes
+        label = self._label
+        for ident, frame in sys._current_frames().items():
+            if ident in exclude:
+                continue
+            name = names.get(ident, f"thread-{ident}")
+            if prefixes and not name.startswith(prefixes):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(label(frame.f_code))
+                frame = frame.f_back
+            stack.append(name.replace(";", ":"))
+            stack.reverse()
+            counts[";".join(stack)] += 1
+
+    def _run(self, stop_event: threading.Event, duration: Union[float, None]) -> None:
+        counts = collections.Counter()
+        exclude = (threading.get_ident(),)
+        deadline = None if duration is None else time.monotonic() + duration
+        ssc_log.info(f"Profiling started ({'until stopped' if duration is None else f'{duration:g} seconds'}).")
+        try:
+            while not stop_event.wait(self.interval):
+                self.sample(counts, exclude)
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+        finally:
+            self.last_path = self._write(counts)
+            ssc_log.info(f"Profiling stopped. {sum(counts.values())} samples written to {self.last_path}.")
+
+    def _write(self, counts: collections.Counter) -> Union[Path, None]:
+        if not counts:
+            return None
+        directory = self.directory if self.directory is not None else ssc_log.DEFAULT_LOG_DIRECTORY
+        path, file = ssc_log._create_timestamped_file(directory, prefix=self.prefix, extension=".collapsed")
+        with file:
+            for stack, count in sorted(counts.items()):
+                file.write(f"{stack} {count}\n")
+        return path
+
+
+MUX_PROXY_THREAD_PREFIXES = ("udp-mux", "udp-proxy")
+"""Names of the threads run by `udp_mux.UdpMux` and `udp_proxy.OneWayUdpProxyThread` start with one of these."""
+
+# The shared profiler used by `install_signal_handler()` and `serve_control_socket()`
+profiler = SamplingProfiler(thread_name_prefixes=MUX_PROXY_THREAD_PREFIXES)
+
+_signal_write_fd: Union[int, None] = None
+
+
+def install_signal_handler(signum: Union[int, None] = None) -> None:
+    """Toggle the shared `profiler` whenever the process receives `signum` (default `SIGUSR1`).
+
+    Must be called from the main thread. Not available on Windows, which has no `SIGUSR1`; use
+    `serve_control_socket()` instead.
+    """
+    global _signal_write_fd
+    if signum is None:
+        signum = getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            raise ValueError("This platform has no SIGUSR1. Pass another signal, or use serve_control_socket()")
+
+    if _signal_write_fd is None:
+        # The handler runs on the main thread between any two bytecodes, possibly while that thread holds a lock
+        # that toggling needs (the profiler's, or one inside `threading`). So the handler only writes to a pipe,
+        # which is async-signal-safe, and a thread does the toggling.
+        read_fd, write_fd = os.pipe()
+
+        def watch() -> None:
+            while os.read(read_fd, 1):
+                profiler.toggle()
+
+        threading.Thread(name="profiler-signal", daemon=True, target=watch).start()
+        _signal_write_fd = write_fd
+
+    signal.signal(signum, lambda signum, frame: os.write(_signal_write_fd, b"\0"))
+
+
+def handle_command(command: str) -> str:
+    """Run a control command against the shared `profiler`, and return the reply.
+
+    Commands are `start [seconds]`, `stop` and `status`.
+    """
+    words = command.split()
+    if not words:
+        return "error: empty command"
+    if words[0] == "start":
+        try:
+            duration = float(words[1]) if len(words) > 1 else None
+        except ValueError:
+            return f"error: bad duration {words[1]!r}"
+        return "started" if profiler.start(duration) else "already running"
+    if words[0] == "stop":
+        if not profiler.running:
+            return "not running"
+        path = profiler.stop(wait=True)
+        return f"stopped: {path}" if path else "stopped: no samples"
+    if words[0] == "status":
+        return f"running: {profiler.running}; last profile: {profiler.last_path}"
+    return f"error: unknown command {words[0]!r}"
+
+
+def serve_control_socket(address: Tuple[str, int] = ("127.0.0.1", 47000)) -> socket.socket:
+    """Answer control commands (see `handle_command()`) sent as UDP datagrams to `address`, on a daemon thread.
+
+    Bind to localhost unless you really mean it: anyone who can reach the socket can start the profiler.
+
+    Returns:
+        socket.socket: The bound control socket. Closing it stops the thread.
+    """
+    control_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    control_socket.bind(address)
+    ssc_log.info(f"Profiler control socket listening on {address[0]}:{control_socket.getsockname()[1]}.")
+
+    def serve() -> None:
+        while True:
+            try:
+                data, source_address = control_socket.recvfrom(1024)
+            except OSError:
+                return
+            reply = handle_command(data.decode("utf-8", errors="replace"))
+            control_socket.sendto(reply.encode("utf-8"), source_address)
+
+    threading.Thread(name="profiler-control", daemon=True, target=serve).start()
+    return control_socket
+
+
+def enable_profiler_control(port: Union[int, None] = None, *, host: str = "127.0.0.1") -> None:
+    """Let the shared `profiler` be switched on and off from outside: by `SIGUSR1`, where the platform has it and
+    this is the main thread, and by a control socket on `port`, if given."""
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        install_signal_handler()
+        ssc_log.info(f"Send SIGUSR1 to process {os.getpid()} to start or stop profiling.")
+    if port is not None:
+        serve_control_socket((host, port))
+
+
+def send_command(command: str, address: Tuple[str, int] = ("127.0.0.1", 47000), timeout: float = 60.0) -> str:
+    """Send a control command to a process serving `serve_control_socket()`, and return its reply."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client_socket:
+        client_socket.settimeout(timeout)
+        client_socket.sendto(command.encode("utf-8"), address)
+        data, _ = client_socket.recvfrom(4096)
+    return data.decode("utf-8", errors="replace")
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Control the sampling profiler of a running process")
+    parser.add_argument("command", choices=("start", "stop", "status"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=47000)
+    parser.add_argument("--duration", type=float, help="Seconds to profile for (start only)")
+    args = parser.parse_args()
+
+    command = args.command
+    if args.command == "start" and args.duration is not None:
+        command += f" {args.duration}"
+    reply = send_command(command, (args.host, args.port))
+    print(reply)
+    return 1 if reply.startswith("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
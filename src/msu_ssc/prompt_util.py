@@ -2,62 +2,167 @@
 Utilities for interactively prompting the user for stuff at the console.
 """
 
+import re
 from typing import List
+from typing import Sequence
+from typing import Set
 from typing import TypeVar
 
 _T = TypeVar("_T")
 
 
+def parse_selection(text: str, count: int) -> Set[int]:
+    """Parse a selection like `"1-250,400 402"` into a set of 0-based indexes into a list of `count` choices.
+
+    Entries are 1-based, separated by commas and/or whitespace, and each is either a number or an inclusive range
+    `first-last`. Raises `ValueError` for anything unparseable or out of range.
+    """
+    selected = set()
+    for token in text.replace(",", " ").split():
+        first, dash, last = token.partition("-")
+        start = int(first)
+        stop = int(last) if dash else start
+        if start > stop:
+            raise ValueError(f"Range {token!r} is backwards")
+        if start < 1 or stop > count:
+            raise ValueError(f"{token!r} is out of range 1-{count}")
+        if dash:
+            selected.update(range(start - 1, stop))
+        else:
+            selected.add(start - 1)
+    return selected
+
+
+class ChoiceIndex:
+    """The choices for a prompt, stringified once, with a casefolded copy for filtering.
+
+    `filter()` narrows the previous result when the new filter text extends the old one, so typing a filter one more
+    character at a time doesn't rescan every choice.
+    """
+
+    def __init__(self, choices: Sequence) -> None:
+        self.labels = [str(choice) for choice in choices]
+        self._folded = [label.casefold() for label in self.labels]
+        self._all = range(len(self.labels))
+        self._last_filter = ("", False)
+        self._last_result: Sequence[int] = self._all
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def filter(self, text: str, fuzzy: bool = False) -> Sequence[int]:
+        """The indexes of the choices containing `text` (case-insensitive).
+
+        If `fuzzy`, the characters of `text` only have to appear in order, not next to each other (so `"g2bn"` matches
+        `"gs2_pass_bin"`).
+        """
+        text = text.casefold()
+        if not text:
+            return self._all
+        last_text, last_fuzzy = self._last_filter
+        candidates = (
+            self._last_result if last_fuzzy == fuzzy and last_text and text.startswith(last_text) else self._all
+        )
+        folded = self._folded
+        if fuzzy:
+            search = re.compile(".*?".join(re.escape(character) for character in text)).search
+            result = [index for index in candidates if search(folded[index])]
+        else:
+            result = [index for index in candidates if text in folded[index]]
+        self._last_filter = (text, fuzzy)
+        self._last_result = result
+        return result
+
+    def render(self, indexes: Sequence[int], selected: Set[int] = frozenset()) -> str:
+        """The lines for `indexes`, numbered as in the full list, with `*` marking the ones in `selected`."""
+        width = len(str(len(self.labels)))
+        labels = self.labels
+        return "\n".join(
+            f" {'*' if index in selected else ' '}{index + 1:{width}}. {labels[index]}" for index in indexes
+        )
+
+
 def get_user_choices(
     choices: List[_T],
     prompt_message: str = f"Choose from the following",
     allow_multiple: bool = True,
     allow_empty: bool = True,
     verify: bool = True,
+    page_size: int = 20,
 ) -> List[_T]:
     """Prompt user to select a subset of given choices interactively at console.
 
+    The choices are shown `page_size` at a time. At the prompt, the user can enter:
+    - Choice numbers and ranges, like `1-250,400`, to select them.
+    - `all` to select every choice that matches the current filter.
+    - Blank to select nothing.
+    - `n`/`p` for the next/previous page.
+    - `/text` to show only choices containing `text`, `~text` for a fuzzy match, or just `/` to clear the filter.
+      Choices keep their numbers while filtered.
+
     Args:
         choices (List[_T]): The valid choices to be selected from. Each entry should have a valid __str__() definition.
         prompt_message (str, optional): The prompt to show the user when selecting. Defaults to f'Choose from the following'.
         allow_multiple (bool, optional): Allow the user to select more than 1 entry. Defaults to True.
         allow_empty (bool, optional): Allow the user to select no entries. Will return an empty list. Defaults to True.
         verify (bool, optional): Present the user with the choices they made and ask them to verify correctness. Defaults to True.
+        page_size (int, optional): How many choices to show at once. Defaults to 20.
 
     Returns:
         List[_T]: The subset of "choices" selected by the user
     """
+    if page_size < 1:
+        raise ValueError(f"page_size must be at least 1, not {page_size!r}")
+    index = ChoiceIndex(choices)
+    visible: Sequence[int] = index.filter("")
+    filter_description = ""
+    page = 0
     error_message = ""
-    selected_choices: List
+    selected_indexes: Set[int] = set()
     while True:
-        # Give the user their options
-        print(f"\n{prompt_message}:")
-        for index, choice in enumerate(choices):
-            print(f"  {(index + 1):3}. {choice}")
-        if error_message != "":
-            print(f"[{error_message}] ", end="")
-        if allow_empty:
-            print(f"[Empty selection: ok] ", end="")
-        else:
-            print(f"[Empty selection: NOT OK] ", end="")
-        if allow_multiple:
-            print(f"[Multiple selection: ok]")
+        # Give the user one page of their options, in a single write
+        page_count = max(1, -(-len(visible) // page_size))
+        page = min(page, page_count - 1)
+        lines = [f"\n{prompt_message}{filter_description}:"]
+        if visible:
+            lines.append(index.render(visible[page * page_size : (page + 1) * page_size], selected_indexes))
         else:
-            print(f"[Multiple selection: NOT OK]")
+            lines.append("  (no matches)")
+        status = f"[Page {page + 1}/{page_count}, {len(visible)} of {len(index)} choices] "
+        if error_message != "":
+            status += f"[{error_message}] "
+        status += "[Empty selection: ok] " if allow_empty else "[Empty selection: NOT OK] "
+        status += "[Multiple selection: ok]" if allow_multiple else "[Multiple selection: NOT OK]"
+        lines.append(status)
+        print("\n".join(lines))
+        error_message = ""
 
         # Parse user index choices
         user_input_raw = input(
-            f'Enter choice(s), separated by spaces. Blank to select nothing, "all" to select everything: '
+            f'Enter choice(s) like "1-5,8". Blank to select nothing, "all" to select everything shown, '
+            + f'"n"/"p" to page, "/text" or "~text" to filter: '
         )
-        if user_input_raw.strip() == "":
-            selected_indexes = []
-        elif user_input_raw.strip().strip("\"'").casefold() == "all":
-            selected_indexes = [x for x in range(len(choices))]
+        user_input = user_input_raw.strip()
+        command = user_input.strip("\"'").casefold()
+        if command in ("n", "p"):
+            page = (page + (1 if command == "n" else -1)) % page_count
+            continue
+        elif user_input.startswith(("/", "~")):
+            text = user_input[1:].strip()
+            visible = index.filter(text, fuzzy=user_input.startswith("~"))
+            filter_description = f" (matching {user_input[0]}{text})" if text else ""
+            page = 0
+            continue
+        elif user_input == "":
+            selected_indexes = set()
+        elif command == "all":
+            selected_indexes = set(visible)
         else:
             try:
-                selected_indexes = [int(x) - 1 for x in user_input_raw.split()]
-            except Exception as exc:
+                selected_indexes = parse_selection(user_input, len(index))
+            except ValueError as exc:
                 error_message = f"Error parsing user choice(s): {exc}. Please try again."
+                selected_indexes = set()
                 continue
 
         # Make sure number of selections is valid
@@ -68,24 +173,7 @@ def get_user_choices(
             continue
         if (not allow_multiple) and len(selected_indexes) > 1:
             error_message = f"You must select exactly 1 option. You selected {len(selected_indexes)}. Please try again."
-            continue
-
-        # Remove duplicates and sort in ascending order
-        selected_indexes = list(set(selected_indexes))
-        selected_indexes.sort()
-
-        # Convert the indexes to a choice list
-        selected_choices: List[_T] = []
-        try:
-            for index in selected_indexes:
-                if index < 0:
-                    # User input "0" becomes index -1
-                    # Which is not an index error, usually.
-                    # But we don't want to allow it.
-                    raise IndexError
-                selected_choices.append(choices[index])
-        except IndexError:
-            error_message = f"You selected an invalid index. Please try again."
+            selected_indexes = set()
             continue
 
         # At this point, input is valid.
@@ -93,9 +181,13 @@ def get_user_choices(
         if not verify:
             break
 
-        print(f"\nYou selected {len(selected_indexes)} choice(s):")
-        for index in selected_indexes:
-            print(f"  {(index + 1):3}. {choices[index]}")
+        ordered = sorted(selected_indexes)
+        lines = [f"\nYou selected {len(ordered)} choice(s):"]
+        if ordered:
+            lines.append(index.render(ordered[:page_size]))
+        if len(ordered) > page_size:
+            lines.append(f"  ... and {len(ordered) - page_size} more")
+        print("\n".join(lines))
         user_input_verify = input(f"Is this correct? (y/n): ").strip().strip("\"'").casefold()
         if user_input_verify == "y" or user_input_verify == "yes":
             break
@@ -104,13 +196,14 @@ def get_user_choices(
         else:
             error_message = f"Could not interpret yes/no input. Please try again."
 
-    return selected_choices
+    return [choices[index] for index in sorted(selected_indexes)]
 
 
 def get_user_choice_single(
     choices: List[_T],
     prompt_message: str = f"Choose from the following",
     verify: bool = True,
+    page_size: int = 20,
 ) -> _T:
     return get_user_choices(
         choices=choices,
@@ -118,6 +211,7 @@ def get_user_choice_single(
         allow_multiple=False,
         allow_empty=False,
         verify=verify,
+        page_size=page_size,
     )[0]
 
 
@@ -1,26 +1,36 @@
+import abc
+import atexit
 import datetime
+import functools
 import logging
+import os
+import queue
+import re
 import sys
+import threading
+import time
 from pathlib import Path
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import TextIO
+from typing import Tuple
 from typing import Union
 
 if sys.version_info >= (3, 8):
     from typing import Literal
 
     TimespecType = Literal["auto", "hours", "minutes", "seconds", "milliseconds", "microseconds"]
+    OverflowPolicyType = Literal["drop_newest", "drop_oldest", "block"]
+    CompressionType = Literal["gzip", "xz"]
 else:
     TimespecType = str
+    OverflowPolicyType = str
+    CompressionType = str
 
 from msu_ssc.path_util import clean_path_part
 from msu_ssc.path_util import file_timestamp
 
-try:
-    from rich.logging import RichHandler
-
-    _rich_imported = True
-except ImportError:
-    _rich_imported = False
-
 logger = logging.getLogger("ssc")
 """The primary logger. It will have the name `ssc`. Use `ssc_log.init()` to configure."""
 
@@ -58,38 +68,757 @@ def utc_filename_timestamp(
         assume_utc=assume_utc,
         assume_local=assume_local,
     )
-    if not extension.startswith("."):
+    if extension and not extension.startswith("."):
         extension = "." + extension
     return clean_path_part("_".join(x for x in (prefix, timestamp_string, suffix) if x) + extension)
 
 
 # logger.setLevel("DEBUG")
 
-plain_text_formatter = logging.Formatter(
-    fmt="[%(asctime)s.%(msecs)03d %(levelname)-8s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+
+class PlainTextFormatter(logging.Formatter):
+    """Formatter for lines like `[2025-02-03 12:34:56.789 INFO    ] message`, in local time.
+
+    Output is identical to a `logging.Formatter` with `PlainTextFormatter.FORMAT` and `PlainTextFormatter.DATEFMT`,
+    but the `YYYY-MM-DD HH:MM:SS` part is only rendered once per second, and the line is built directly
+    instead of through `%`-style interpolation of the record's attributes.
+    """
+
+    FORMAT = "[%(asctime)s.%(msecs)03d %(levelname)-8s] %(message)s"
+    DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self) -> None:
+        super().__init__(fmt=self.FORMAT, datefmt=self.DATEFMT)
+        self._cached_time = (None, "")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = record.getMessage()
+
+        second = int(record.created)
+        cached_second, asctime = self._cached_time
+        if second != cached_second:
+            asctime = time.strftime(self.DATEFMT, self.converter(second))
+            self._cached_time = (second, asctime)
+        record.asctime = asctime
+
+        s = f"[{asctime}.{int(record.msecs):03d} {record.levelname:<8}] {record.message}"
+
+        # Same as `logging.Formatter.format()`
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + record.exc_text
+        if record.stack_info:
+            if s[-1:] != "\n":
+                s = s + "\n"
+            s = s + self.formatStack(record.stack_info)
+        return s
+
+
+plain_text_formatter = PlainTextFormatter()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatter for one JSON object per line, with every (non-reserved) attribute of the record.
+
+    Output is identical to `pythonjsonlogger`'s `JsonFormatter(reserved_attrs=reserved_attrs)`. Records whose
+    attributes are all `str`, `int`, finite `float`, `bool` or `None` (i.e., nearly all of them) are serialized
+    directly, with the JSON for each attribute name cached. Anything else, such as exception info or `extra`
+    objects, is handed to a `JsonFormatter`.
+    """
+
+    def __init__(self, reserved_attrs: Iterable[str] = ("msg", "args", "levelno")) -> None:
+        from json.encoder import encode_basestring_ascii
+
+        super().__init__()
+        self._json_str = encode_basestring_ascii
+        self.reserved_attrs = tuple(reserved_attrs)
+        self._skip = frozenset(self.reserved_attrs) | {"message"}
+        self._key_prefixes: Dict[str, Union[str, None]] = {}
+        self._fallback_formatter: Union[logging.Formatter, None] = None
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.exc_info or record.exc_text or record.stack_info or isinstance(record.msg, dict):
+            return self._fallback(record)
+
+        record.message = record.getMessage()
+        json_str = self._json_str
+        parts = ['{"message": ', json_str(record.message)]
+        skip = self._skip
+        key_prefixes = self._key_prefixes
+        for key, value in record.__dict__.items():
+            if key in skip:
+                continue
+            try:
+                prefix = key_prefixes[key]
+            except KeyError:
+                if not isinstance(key, str):
+                    return self._fallback(record)
+                prefix = key_prefixes[key] = None if key.startswith("_") else f", {json_str(key)}: "
+            if prefix is None:
+                continue
+
+            value_type = type(value)
+            if value_type is str:
+                encoded = json_str(value)
+            elif value is None:
+                encoded = "null"
+            elif value_type is int:
+                encoded = int.__repr__(value)
+            elif value_type is float and _FLOAT_MIN <= value <= _FLOAT_MAX:
+                encoded = float.__repr__(value)
+            elif value_type is bool:
+                encoded = "true" if value else "false"
+            else:
+                return self._fallback(record)
+            parts.append(prefix)
+            parts.append(encoded)
+        parts.append("}")
+        return "".join(parts)
+
+    def _fallback(self, record: logging.LogRecord) -> str:
+        if self._fallback_formatter is None:
+            from pythonjsonlogger.jsonlogger import JsonFormatter
+
+            self._fallback_formatter = JsonFormatter(reserved_attrs=self.reserved_attrs)
+        return self._fallback_formatter.format(record)
+
+
+_FLOAT_MAX = sys.float_info.max
+_FLOAT_MIN = -_FLOAT_MAX
+
+
+_iso_str_cache = (None, "")
 
 
 def _iso_str(timestamp: "datetime.datetime") -> str:
-    string = f"{timestamp:%Y-%m-%d %H:%M:%S.%f}"
-    milliseconds_string = string[:-3]
-    return f"[{milliseconds_string}]"
+    # Only re-render the `YYYY-MM-DD HH:MM:SS` part when the second changes
+    global _iso_str_cache
+    second = timestamp.replace(microsecond=0)
+    cached_second, seconds_string = _iso_str_cache
+    if second != cached_second:
+        seconds_string = f"{second:%Y-%m-%d %H:%M:%S}"
+        _iso_str_cache = (second, seconds_string)
+    return f"[{seconds_string}.{timestamp.microsecond // 1000:03d}]"
 
 
-if _rich_imported:
-    console_handler = RichHandler(
-        level="DEBUG",
-        show_time=True,
-        omit_repeated_times=False,
-        rich_tracebacks=True,
-        # log_time_format="[%Y-%m-%d %H:%M:%S.%f]",
-        log_time_format=_iso_str,
+_console_handler: Union[logging.Handler, None] = None
+
+
+def _get_console_handler() -> logging.Handler:
+    """The console handler: a `RichHandler` if `rich` is installed, else a plain `StreamHandler`.
+
+    Created on first use, so importing this module doesn't import `rich`. Also available as `console_handler`.
+    """
+    global _console_handler
+    if _console_handler is not None:
+        return _console_handler
+
+    try:
+        from rich.logging import RichHandler
+    except ImportError:
+        handler = logging.StreamHandler()
+        handler.setLevel("DEBUG")
+        handler.setFormatter(plain_text_formatter)
+    else:
+        handler = RichHandler(
+            level="DEBUG",
+            show_time=True,
+            omit_repeated_times=False,
+            rich_tracebacks=True,
+            # log_time_format="[%Y-%m-%d %H:%M:%S.%f]",
+            log_time_format=_iso_str,
+        )
+    _console_handler = handler
+    return handler
+
+
+class BoundedQueueHandler(logging.Handler):
+    """Like `logging.handlers.QueueHandler`, for a bounded queue. Never blocks the logging thread (unless asked to).
+
+    When the queue is full, `overflow` decides what happens:
+    - `"drop_newest"`: Discard the record being logged. (Default)
+    - `"drop_oldest"`: Discard the oldest queued record to make room for the new one.
+    - `"block"`: Wait up to `block_timeout` seconds for room, then discard the new record.
+
+    Every discarded record is counted in `dropped_count`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        *,
+        overflow: OverflowPolicyType = "drop_newest",
+        block_timeout: float = 0.1,
+    ) -> None:
+        if overflow not in ("drop_newest", "drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        super().__init__()
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=maxsize)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.enqueued_count = 0
+        self.dropped_count = 0
+        self._count_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the stdlib version, do NOT format the record here, and leave all
+        # formatting, including tracebacks, to the handlers on the listener thread.
+        # Only merge args that may be mutable into the message. Immutable args are
+        # left alone, so handlers can still see the template (e.g. to intern it).
+        args = record.args
+        if args and not (type(args) is tuple and all(type(arg) in _IMMUTABLE_ARG_TYPES for arg in args)):
+            record.message = record.getMessage()
+            record.msg = record.message
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._count_dropped()
+                try:
+                    self.queue.put_nowait(record)
+                except queue.Full:
+                    # Another thread filled the slot first. Give up on this one.
+                    self._count_dropped()
+                    return
+            else:
+                self._count_dropped()
+                return
+        with self._count_lock:
+            self.enqueued_count += 1
+
+    def _count_dropped(self) -> None:
+        with self._count_lock:
+            self.dropped_count += 1
+
+
+_IMMUTABLE_ARG_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
+
+_queue_handler: Union[BoundedQueueHandler, None] = None
+_queue_listener: "Union[logging.handlers.QueueListener, None]" = None
+
+
+def _add_handler(handler: logging.Handler) -> None:
+    """Attach a handler to the `ssc` logger, or to the background listener if queued logging is active."""
+    if _queue_listener is not None:
+        if handler not in _queue_listener.handlers:
+            # The listener thread reads this tuple on every record, so swap it in whole.
+            _queue_listener.handlers = _queue_listener.handlers + (handler,)
+        # Even for a handler that is already there, since `init()` may have just changed its level
+        _update_queue_level()
+    else:
+        logger.addHandler(handler)
+
+
+def _update_queue_level() -> None:
+    # Records that no handler behind the queue wants shouldn't take up room in it
+    _queue_handler.setLevel(min((handler.level for handler in _queue_listener.handlers), default=logging.NOTSET))
+
+
+def _start_queued_logging(
+    maxsize: int,
+    overflow: OverflowPolicyType,
+) -> None:
+    """Move all handlers on the `ssc` logger behind a `BoundedQueueHandler` driven by a background thread."""
+    global _queue_handler, _queue_listener
+    if _queue_listener is not None:
+        return
+
+    import logging.handlers
+
+    # The flight recorder stays on the logger: it only stores references, which is cheaper than queueing them
+    existing_handlers = tuple(handler for handler in logger.handlers if handler is not _flight_recorder)
+    for handler in existing_handlers:
+        logger.removeHandler(handler)
+
+    class _DrainingQueueListener(logging.handlers.QueueListener):
+        def enqueue_sentinel(self) -> None:
+            # The stdlib uses `put_nowait()`, which raises `queue.Full` when the handlers are
+            # behind -- exactly when draining on shutdown matters most. Wait for room instead.
+            self.queue.put(self._sentinel)
+
+    _queue_handler = BoundedQueueHandler(maxsize=maxsize, overflow=overflow)
+    _queue_listener = _DrainingQueueListener(
+        _queue_handler.queue,
+        *existing_handlers,
+        respect_handler_level=True,
     )
-else:
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel("DEBUG")
-    console_handler.setFormatter(plain_text_formatter)
+    _update_queue_level()
+    _queue_listener.start()
+    logger.addHandler(_queue_handler)
+    atexit.register(shutdown)
+
+
+def queue_stats() -> dict:
+    """Counts of records enqueued and dropped by queued logging. All zero if queued logging is not active."""
+    if _queue_handler is None:
+        return {"enqueued": 0, "dropped": 0, "pending": 0}
+    return {
+        "enqueued": _queue_handler.enqueued_count,
+        "dropped": _queue_handler.dropped_count,
+        "pending": _queue_handler.queue.qsize(),
+    }
+
+
+def shutdown() -> None:
+    """Stop queued logging, if active.
+
+    Every record already in the queue is handed to the handlers before this returns. Afterwards, the
+    handlers are attached directly to the `ssc` logger again, so any later log calls are not lost.
+    Safe to call more than once. Registered with `atexit` when queued logging is started.
+    """
+    global _queue_handler, _queue_listener
+    if _queue_listener is None:
+        return
+
+    listener, handler = _queue_listener, _queue_handler
+    # Keep the queue handler attached until the listener has drained, so records logged
+    # meanwhile still go somewhere.
+    listener.stop()
+    _queue_listener = None
+    _queue_handler = None
+    # Swap the handlers in a single assignment, so no record goes to neither (or both).
+    logger.handlers = [existing for existing in logger.handlers if existing is not handler] + [
+        target for target in listener.handlers if target not in logger.handlers
+    ]
+    # Records enqueued after the sentinel, before the swap
+    while True:
+        try:
+            listener.handle(handler.queue.get_nowait())
+        except queue.Empty:
+            break
+    if handler.dropped_count:
+        logger.warning(
+            f"Queued logging dropped {handler.dropped_count:,} of "
+            + f"{handler.dropped_count + handler.enqueued_count:,} records (queue full)."
+        )
+
+
+class _SegmentNamer:
+    """Names for the finished segments of the log file at `active_path`, made by `utc_filename_timestamp()` for when
+    each segment began, like `ssc_2025-02-03T12_00_00.log` for `ssc.log`.
+
+    If a name is already taken (several rotations in one second), the timestamp is given microseconds, and then a
+    sequence number, like `ssc_2025-02-03T12_00_00.000000_1.log`. `sidecar_suffixes` are files that go with each
+    segment, like the `.idx` of a binary log, named by appending the suffix to the (uncompressed) segment's name.
+    """
+
+    def __init__(self, active_path: Path, sidecar_suffixes: Tuple[str, ...] = ()) -> None:
+        self.active_path = active_path
+        self.sidecar_suffixes = sidecar_suffixes
+        self.pattern = self._pattern()
+
+    def name(self, start: datetime.datetime, timespec: TimespecType = "seconds", sequence: str = "") -> str:
+        return utc_filename_timestamp(
+            start,
+            prefix=self.active_path.stem,
+            suffix=sequence,
+            extension=self.active_path.suffix,
+            timespec=timespec,
+        )
+
+    def _pattern(self) -> "re.Pattern":
+        # Exactly the names `name()` makes, found by making one and swapping its timestamp for a regex
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+        timestamp = "1970-01-01T00_00_00"
+        head, _, tail = self.name(epoch).partition(timestamp)
+        return re.compile(
+            rf"^{re.escape(head)}(\d{{4}}-\d\d-\d\dT\d\d_\d\d_\d\d)(?:\.(\d{{6}}))?(?:_(\d+))?"
+            + rf"{re.escape(tail)}(?:\.gz|\.xz)?$"
+        )
+
+    def path(self, segment_start: float) -> Path:
+        """A free name for a segment that began at `segment_start` (POSIX timestamp)."""
+        start = datetime.datetime.fromtimestamp(segment_start, tz=datetime.timezone.utc)
+        attempt = 0
+        while True:
+            # Plain seconds if that's free, then microseconds, then microseconds and a sequence number
+            timespec = "seconds" if attempt == 0 else "microseconds"
+            name = self.name(start, timespec, str(attempt - 1) if attempt > 1 else "")
+            candidate = self.active_path.with_name(name)
+            # The segment may already have been compressed (or be in the middle of it) under another name
+            if not any(
+                candidate.with_name(name + extension).exists()
+                for extension in ("", ".gz", ".xz", ".gz.partial", ".xz.partial") + self.sidecar_suffixes
+            ):
+                return candidate
+            attempt += 1
+
+    def sidecars(self, segment_path: Path) -> List[Path]:
+        name = segment_path.name
+        if name.endswith((".gz", ".xz")):
+            name = name[:-3]
+        return [segment_path.with_name(name + suffix) for suffix in self.sidecar_suffixes]
+
+
+class _SegmentArchiver:
+    """Background thread that compresses finished log segments and enforces a retention limit.
+
+    Nothing here ever runs on the thread that is logging.
+    """
+
+    _OPENERS = {
+        "gzip": ("gzip", ".gz"),
+        "xz": ("lzma", ".xz"),
+    }
+
+    def __init__(
+        self,
+        *,
+        compression: Union[CompressionType, None],
+        retention_bytes: Union[int, None],
+        namer: _SegmentNamer,
+    ) -> None:
+        if compression is not None and compression not in self._OPENERS:
+            raise ValueError(f"Unknown compression {compression!r}. Must be one of {tuple(self._OPENERS)}")
+        self.compression = compression
+        self.retention_bytes = retention_bytes
+        self.namer = namer
+        self.active_path = namer.active_path
+        self._jobs: "queue.Queue[Union[Path, None]]" = queue.Queue()
+        self._thread: Union[threading.Thread, None] = None
+
+    def submit(self, segment_path: Path) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                name=f"ssc-log-archiver-{self.active_path.name}",
+                target=self._run,
+                daemon=True,
+            )
+            self._thread.start()
+        self._jobs.put(segment_path)
+
+    def join(self) -> None:
+        """Finish all pending work and stop the thread."""
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            segment_path = self._jobs.get()
+            try:
+                if segment_path is not None and self.compression and segment_path.exists():
+                    self._compress(segment_path)
+                # Wait until caught up, so segments that are still waiting to be compressed aren't pruned
+                if self.retention_bytes is not None and self._jobs.empty():
+                    self._enforce_retention()
+            except Exception as exc:
+                # Can't log this to `logger` without risking recursion into the handler that submitted it
+                print(f"ssc_log: unable to archive log segment {segment_path}: {exc!r}", file=sys.stderr)
+            if segment_path is None:
+                return
+
+    def _compress(self, segment_path: Path) -> None:
+        import importlib
+        import shutil
+
+        module_name, extension = self._OPENERS[self.compression]
+        module = importlib.import_module(module_name)
+        compressed_path = segment_path.with_name(segment_path.name + extension)
+        partial_path = compressed_path.with_name(compressed_path.name + ".partial")
+        with open(segment_path, "rb") as source, module.open(partial_path, "wb") as destination:
+            shutil.copyfileobj(source, destination, 1024 * 1024)
+        os.replace(partial_path, compressed_path)
+        segment_path.unlink()
+
+    def _enforce_retention(self) -> None:
+        # Only this handler's own segments: `mux.log` must not touch `mux_proxy.log` or its segments
+        segments = {}
+        for entry in os.scandir(self.active_path.parent):
+            match = self.namer.pattern.match(entry.name)
+            if match:
+                try:
+                    size = entry.stat().st_size
+                except FileNotFoundError:
+                    continue
+                # (seconds, microseconds, sequence number). A segment with the seconds-only name was the first
+                # of its second, and a segment without a sequence number was the first of its microsecond.
+                seconds, microseconds, sequence = match.group(1, 2, 3)
+                segments[Path(entry.path)] = ((seconds, microseconds or "", int(sequence or -1)), size)
+        total = sum(size for _, size in segments.values())
+        if self.active_path.exists():
+            total += self.active_path.stat().st_size
+
+        # Oldest first. The newest segment is always kept, even if the active file alone is over the limit.
+        for path in sorted(segments, key=lambda path: segments[path][0])[:-1]:
+            if total <= self.retention_bytes:
+                break
+            path.unlink()
+            total -= segments[path][1]
+            for sidecar in self.namer.sidecars(path):
+                try:
+                    sidecar.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+class RotatingUtcFileHandler(logging.FileHandler):
+    """A `FileHandler` that rotates by size and/or UTC time boundary.
+
+    Records are always written to `filename`. When the file reaches `rotate_bytes` (counted in characters written,
+    so approximate for non-ASCII text), or when the UTC time crosses a multiple of `rotate_interval` (e.g., every
+    hour on the hour for `datetime.timedelta(hours=1)`), the file is renamed to a name made by
+    `utc_filename_timestamp()` for when the segment began, like `ssc_2025-02-03T12_00_00.log` for `ssc.log`,
+    and a new file is started.
+
+    If a segment's name is already taken (several rotations in one second), the timestamp is given microseconds,
+    and then a sequence number, like `ssc_2025-02-03T12_00_00.000000_1.log`.
+
+    Finished segments are compressed with `compression` (`"gzip"` or `"xz"`), and after each rotation the oldest
+    segments are deleted to keep the total size of this log under `retention_bytes`, although the newest segment is
+    always kept. Both happen on a background thread. Closing the handler waits for that thread to finish.
+    """
+
+    def __init__(
+        self,
+        filename: Union[Path, str],
+        *,
+        rotate_bytes: Union[int, None] = None,
+        rotate_interval: Union[datetime.timedelta, None] = None,
+        compression: Union[CompressionType, None] = None,
+        retention_bytes: Union[int, None] = None,
+        encoding: Union[str, None] = "utf-8",
+    ) -> None:
+        super().__init__(filename=filename, encoding=encoding)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval_seconds = rotate_interval.total_seconds() if rotate_interval else None
+        if self.rotate_interval_seconds is not None and self.rotate_interval_seconds <= 0:
+            raise ValueError(f"rotate_interval must be positive, not {rotate_interval!r}")
+
+        path = Path(self.baseFilename)
+        self._namer = _SegmentNamer(path)
+        self._archiver = _SegmentArchiver(
+            compression=compression,
+            retention_bytes=retention_bytes,
+            namer=self._namer,
+        )
+        self._start_segment(time.time(), size=path.stat().st_size if path.exists() else 0)
+
+    def _start_segment(self, now: float, size: int = 0) -> None:
+        self._segment_start = now
+        self._segment_size = size
+        if self.rotate_interval_seconds is not None:
+            self._next_boundary = (now // self.rotate_interval_seconds + 1) * self.rotate_interval_seconds
+        else:
+            self._next_boundary = float("inf")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            if record.created >= self._next_boundary or (
+                self.rotate_bytes is not None
+                and self._segment_size > 0
+                and self._segment_size + len(msg) > self.rotate_bytes
+            ):
+                self.do_rollover(record.created)
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.flush()
+            self._segment_size += len(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def do_rollover(self, now: Union[float, None] = None) -> None:
+        """Finish the current segment, hand it to the background archiver, and begin a new one."""
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        active_path = Path(self.baseFilename)
+        if active_path.exists() and active_path.stat().st_size > 0:
+            segment_path = self._namer.path(self._segment_start)
+            os.replace(active_path, segment_path)
+            self._archiver.submit(segment_path)
+        self._start_segment(time.time() if now is None else now)
+
+    def close(self) -> None:
+        super().close()
+        self._archiver.join()
+
+
+def _create_timestamped_file(
+    directory: Path,
+    *,
+    prefix: str,
+    extension: str = ".log",
+) -> Tuple[Path, TextIO]:
+    """Create and open a new UTF-8 text file in `directory`, named by `utc_filename_timestamp()` for now, to the
+    millisecond. If that name is taken, a sequence number is added, like `prefix_2025-02-03T12_34_56.789_1.log`.
+
+    Never opens an existing file, even if another thread or process is creating files with the same prefix.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    attempt = 0
+    while True:
+        path = directory / utc_filename_timestamp(
+            now, prefix=prefix, suffix=str(attempt) if attempt else "", extension=extension, timespec="milliseconds"
+        )
+        try:
+            return path, open(path, "x", encoding="utf-8")
+        except FileExistsError:
+            attempt += 1
+
+
+class FlightRecorderHandler(logging.Handler):
+    """Keep the last `capacity` records, at all levels, in memory. Write them to a file when something goes wrong.
+
+    Records are stored as-is in a preallocated ring buffer, and only formatted when dumped. When a record at
+    `dump_level` or above arrives (or `dump()` is called), the buffer is written, oldest first, to a new
+    timestamped file in `directory`, like `flight_recorder_2025-02-03T12_34_56.789.log`, and then emptied.
+
+    Give the logger a level of DEBUG and the other handlers a level of INFO (`ssc_log.init()` does this with
+    `flight_recorder_size`) to have DEBUG context for errors without paying to format and write DEBUG records.
+    Note that records are formatted when dumped, so mutable `args` show their values at that time.
+
+    With `background=True`, a dump triggered by a record only takes the records from the buffer on the logging
+    thread, and a background thread formats and writes them (`ssc_log.init()` does this with `queued=True`).
+    `flush()` and `close()` wait for those writes. `dump()` always writes before it returns.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        *,
+        directory: Union[Path, str, None] = None,
+        dump_level: int = logging.ERROR,
+        prefix: str = "flight_recorder",
+        background: bool = False,
+    ) -> None:
+        super().__init__(level=logging.NOTSET)
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, not {capacity!r}")
+        self.capacity = capacity
+        self.directory = Path(directory) if directory is not None else _default_log_directory()
+        self.dump_level = dump_level
+        self.prefix = prefix
+        self.background = background
+        self.setFormatter(plain_text_formatter)
+        self._buffer: List[Union[logging.LogRecord, None]] = [None] * capacity
+        self._next = 0
+        self._count = 0
+        self._dumps: "queue.Queue[Union[tuple, None]]" = queue.Queue()
+        self._dump_thread: Union[threading.Thread, None] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._buffer[self._next] = record
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def handle(self, record: logging.LogRecord):
+        result = super().handle(record)
+        # Dump here, rather than in `emit()`, so the file isn't written while holding the handler's lock
+        if result and record.levelno >= self.dump_level:
+            if self.background:
+                self._dump_in_background(reason=f"{record.levelname} logged")
+            else:
+                self.dump(reason=f"{record.levelname} logged")
+        return result
+
+    def _dump_in_background(self, reason: str) -> None:
+        records = self._take_records()
+        if not records:
+            return
+        with self.lock:
+            if self._dump_thread is None:
+                self._dump_thread = threading.Thread(
+                    name=f"ssc-log-{self.prefix}",
+                    target=self._run_dumps,
+                    daemon=True,
+                )
+                self._dump_thread.start()
+        self._dumps.put((records, reason))
+
+    def _run_dumps(self) -> None:
+        while True:
+            job = self._dumps.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as exc:
+                # Can't log this to `logger` without risking another dump
+                print(f"ssc_log: unable to write flight recorder dump: {exc!r}", file=sys.stderr)
+            finally:
+                self._dumps.task_done()
+
+    def _take_records(self) -> List[logging.LogRecord]:
+        with self.lock:
+            start = (self._next - self._count) % self.capacity
+            records = [self._buffer[(start + offset) % self.capacity] for offset in range(self._count)]
+            self._buffer = [None] * self.capacity
+            self._next = 0
+            self._count = 0
+        return records
+
+    def dump(self, reason: str = "on demand") -> Union[Path, None]:
+        """Write the buffered records to a new timestamped file and empty the buffer.
+
+        Returns:
+            Path | None: The file written, or `None` if the buffer was empty.
+        """
+        records = self._take_records()
+        if not records:
+            return None
+        return self._write(records, reason)
+
+    def _write(self, records: List[logging.LogRecord], reason: str) -> Path:
+        path, file = _create_timestamped_file(self.directory, prefix=self.prefix)
+        with file:
+            file.write(f"# Flight recorder dump ({reason}): last {len(records)} record(s)\n")
+            for record in records:
+                try:
+                    file.write(self.format(record) + "\n")
+                except Exception:
+                    self.handleError(record)
+        return path
+
+    def flush(self) -> None:
+        """Wait for dumps being written in the background."""
+        if self._dump_thread is not None:
+            self._dumps.join()
+
+    def close(self) -> None:
+        with self.lock:
+            thread, self._dump_thread = self._dump_thread, None
+        if thread is not None:
+            self._dumps.put(None)
+            thread.join()
+        super().close()
+
+
+_flight_recorder: Union[FlightRecorderHandler, None] = None
+
+
+def dump_flight_recorder(reason: str = "on demand") -> Union[Path, None]:
+    """Dump the flight recorder installed by `init(flight_recorder_size=...)`. See `FlightRecorderHandler.dump()`."""
+    if _flight_recorder is None:
+        return None
+    return _flight_recorder.dump(reason=reason)
 
 
 def init(
@@ -97,18 +826,68 @@ def init(
     *,
     plain_text_file_path: Union[Path, str, None] = None,
     jsonl_file_path: Union[Path, str, None] = None,
+    binary_file_path: Union[Path, str, None] = None,
     plain_text_level: Union[str, None] = None,
     jsonl_level: Union[str, None] = None,
+    binary_level: Union[str, None] = None,
     console_level: Union[str, None] = None,
+    queued: bool = False,
+    queue_size: int = 10_000,
+    queue_overflow: OverflowPolicyType = "drop_newest",
+    rotate_bytes: Union[int, None] = None,
+    rotate_interval: Union[datetime.timedelta, None] = None,
+    compression: Union[CompressionType, None] = None,
+    retention_bytes: Union[int, None] = None,
+    flight_recorder_size: Union[int, None] = None,
+    flight_recorder_directory: Union[Path, str, None] = None,
 ) -> None:
+    """Configure the `ssc` logger.
+
+    With `queued=True`, log calls only put the record on a bounded queue (`queue_size` records), and all
+    handlers run on a background thread, so a slow disk or terminal never stalls the caller. When the queue is
+    full, records are handled according to `queue_overflow` (see `BoundedQueueHandler`). Queued records are
+    flushed at exit, or by calling `shutdown()`.
+
+    If any of `rotate_bytes`, `rotate_interval`, `compression` or `retention_bytes` are given, the plain text and
+    JSONL files are rotated, compressed and pruned by a `RotatingUtcFileHandler`, and the binary file likewise by its
+    `BinaryLogHandler`. Each file's limits apply to that file separately.
+
+    `binary_file_path` adds a compact binary log with a time index (see `msu_ssc.ssc_log_binary`).
+
+    `flight_recorder_size` keeps that many of the most recent records, at ALL levels, in memory, and writes them to a
+    timestamped file in `flight_recorder_directory` (default `DEFAULT_LOG_DIRECTORY`) when an ERROR is logged, or
+    on `dump_flight_recorder()`. The `ssc` logger's level becomes DEBUG, while the other handlers keep `level`.
+    With `queued=True`, the flight recorder is not behind the queue but writes its dumps on a background thread, and
+    the queue only takes records at or above the lowest level of the handlers behind it.
+    """
+    global _flight_recorder
+    rotation = {
+        "rotate_bytes": rotate_bytes,
+        "rotate_interval": rotate_interval,
+        "compression": compression,
+        "retention_bytes": retention_bytes,
+    }
     if level:
         logger.setLevel(level.upper())
+    if flight_recorder_size:
+        logger.setLevel(logging.DEBUG)
+        plain_text_level = plain_text_level or level
+        jsonl_level = jsonl_level or level
+        binary_level = binary_level or level
+        console_level = console_level or level
+
+    if queued:
+        _start_queued_logging(
+            maxsize=queue_size,
+            overflow=queue_overflow,
+        )
 
     if plain_text_file_path:
         plain_text_level = plain_text_level or level
         _log_to_file(
             plain_text_file_path,
             level=plain_text_level,
+            **rotation,
         )
 
     if jsonl_file_path:
@@ -116,15 +895,47 @@ def init(
         _log_to_jsonl_file(
             jsonl_file_path,
             level=jsonl_level,
+            **rotation,
+        )
+
+    if binary_file_path:
+        binary_level = binary_level or level
+        _log_to_binary_file(
+            binary_file_path,
+            level=binary_level,
+            **rotation,
+        )
+
+    if flight_recorder_size and _flight_recorder is None:
+        _flight_recorder = FlightRecorderHandler(
+            capacity=flight_recorder_size,
+            directory=flight_recorder_directory,
         )
+        # Directly on the logger even when queued, so DEBUG records are never queued or formatted
+        logger.addHandler(_flight_recorder)
+    if _flight_recorder is not None and _queue_listener is not None:
+        # Queued logging promises that log calls don't wait on the disk, and a dump is up to `capacity` records
+        _flight_recorder.background = True
 
     console_level = console_level or level
+    console_handler = _get_console_handler()
     console_handler.setLevel(console_level)
-    logger.addHandler(console_handler)
+    _add_handler(console_handler)
+
 
+@functools.lru_cache(maxsize=None)
+def _default_log_directory() -> Path:
+    # Should be `./logs/`
+    return Path(__file__).expanduser().resolve().parent.parent / "logs"
 
-DEFAULT_LOG_DIRECTORY = Path(__file__).expanduser().resolve().parent.parent / "logs"
-"""Should be `./logs/`"""
+
+def __getattr__(name: str):
+    # Module attributes that are only built when first used
+    if name == "console_handler":
+        return _get_console_handler()
+    if name == "DEFAULT_LOG_DIRECTORY":
+        return _default_log_directory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def log_to_default_file() -> None:
@@ -135,17 +946,33 @@ def log_to_default_file() -> None:
     import datetime
 
     file_name = f"stk_{datetime.datetime.now():%Y-%m-%dT%H_%M_%S}.log"
-    file_path = DEFAULT_LOG_DIRECTORY / file_name
+    file_path = _default_log_directory() / file_name
     _log_to_file(path=file_path)
 
 
+def _file_handler(
+    resolved_path: Path,
+    *,
+    encoding: Union[str, None],
+    **rotation,
+) -> logging.FileHandler:
+    if any(value is not None for value in rotation.values()):
+        return RotatingUtcFileHandler(resolved_path, encoding=encoding, **rotation)
+    return logging.FileHandler(filename=resolved_path, encoding=encoding)
+
+
 def _log_to_file(
     path: Union[Path, str],
     level: Union[str, None] = None,
     *,
     encoding: str | None = "utf-8",
+    **rotation,
 ) -> None:
-    """Begin logging in plaintext to the given file. File will be APPENDED, and encoded in UTF-8"""
+    """Begin logging in plaintext to the given file. File will be APPENDED, and encoded in UTF-8
+
+    Keyword arguments `rotate_bytes`, `rotate_interval`, `compression` and `retention_bytes` are passed to
+    `RotatingUtcFileHandler`. If all are `None` (or absent), the file is never rotated.
+    """
     resolved_path = Path(path).expanduser().resolve()
     if not resolved_path.parent.exists():
         resolved_path.parent.mkdir(
@@ -153,26 +980,27 @@ def _log_to_file(
             exist_ok=True,
         )
 
-    file_handler = logging.FileHandler(
-        filename=Path(resolved_path).expanduser().resolve(),
-        encoding=encoding,
-    )
+    file_handler = _file_handler(resolved_path, encoding=encoding, **rotation)
 
     if level:
         file_handler.setLevel(level)
     file_handler.setFormatter(plain_text_formatter)
-    logger.addHandler(file_handler)
+    _add_handler(file_handler)
     logger.debug(f"Begin logging to {resolved_path.__fspath__()!r}")
 
 
 def _log_to_jsonl_file(
     path: Union[Path, str],
     level: Union[str, None] = None,
+    **rotation,
 ) -> None:
-    """Begin logging to the given file. File will be APPENDED, and encoded in UTF-8"""
+    """Begin logging to the given file. File will be APPENDED, and encoded in UTF-8
+
+    Keyword arguments are the same as `_log_to_file()`.
+    """
     try:
-        from pythonjsonlogger.jsonlogger import JsonFormatter
-        # from pythonjsonlogger.json import JsonFormatter
+        # `JsonLinesFormatter` hands unusual records to pythonjsonlogger
+        import pythonjsonlogger  # noqa: F401
     except ImportError:
         logger.error("pythonjsonlogger is not installed. Please install it to use JSON logging.")
         raise
@@ -183,11 +1011,11 @@ def _log_to_jsonl_file(
             parents=True,
             exist_ok=True,
         )
-    file_handler = logging.FileHandler(filename=Path(resolved_path).expanduser().resolve())
+    file_handler = _file_handler(resolved_path, encoding=None, **rotation)
 
     if level:
         file_handler.setLevel(level)
-    json_formatter = JsonFormatter(
+    json_formatter = JsonLinesFormatter(
         reserved_attrs=(
             "msg",
             "args",
@@ -195,10 +1023,187 @@ def _log_to_jsonl_file(
         ),
     )
     file_handler.setFormatter(json_formatter)
-    logger.addHandler(file_handler)
+    _add_handler(file_handler)
     logger.debug(f"Begin logging to {resolved_path.__fspath__()!r}")
 
 
+def _log_to_binary_file(
+    path: Union[Path, str],
+    level: Union[str, None] = None,
+    **rotation,
+) -> None:
+    """Begin logging to the given binary log file. File will be APPENDED. See `msu_ssc.ssc_log_binary`
+
+    Keyword arguments `rotate_bytes`, `rotate_interval`, `compression` and `retention_bytes` are passed to
+    `BinaryLogHandler`.
+    """
+    from msu_ssc.ssc_log_binary import BinaryLogHandler
+
+    resolved_path = Path(path).expanduser().resolve()
+    if not resolved_path.parent.exists():
+        resolved_path.parent.mkdir(
+            parents=True,
+            exist_ok=True,
+        )
+    file_handler = BinaryLogHandler(resolved_path, **rotation)
+
+    if level:
+        file_handler.setLevel(level)
+    _add_handler(file_handler)
+    logger.debug(f"Begin logging to {resolved_path.__fspath__()!r}")
+
+
+class _HotPathLog(abc.ABC):
+    """Base for the hot path loggers. Subclasses decide, in `_allow()`, whether a call is logged.
+
+    Messages are built lazily: either `%`-style `msg` and `args`, like the standard `logging` methods, or a callable
+    `msg` that returns the message. Nothing is formatted for calls that are suppressed or below the logger's level,
+    so those cost little more than a level check and a counter.
+
+    Counters are not locked, so counts are approximate if the same instance is used by several threads at once.
+    """
+
+    def __init__(self, logger: Union[logging.Logger, None] = None) -> None:
+        self.logger = logger if logger is not None else globals()["logger"]
+        self._summary: Union[tuple, None] = None
+
+    @abc.abstractmethod
+    def _allow(self, level: int, msg, args: tuple) -> bool:
+        """Whether to log this call. May set `self._summary` to `(level, msg, args)` to be logged before it."""
+
+    def _log(self, level: int, msg, args: tuple) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        allowed = self._allow(level, msg, args)
+        if self._summary is not None:
+            summary_level, summary_msg, summary_args = self._summary
+            self._summary = None
+            self.logger.log(summary_level, summary_msg, *summary_args, **_STACKLEVEL)
+        if not allowed:
+            return
+        if callable(msg):
+            msg = msg()
+        self.logger.log(level, msg, *args, **_STACKLEVEL)
+
+    def log(self, level: int, msg, *args) -> None:
+        self._log(level, msg, args)
+
+    def debug(self, msg, *args) -> None:
+        self._log(logging.DEBUG, msg, args)
+
+    def info(self, msg, *args) -> None:
+        self._log(logging.INFO, msg, args)
+
+    def warning(self, msg, *args) -> None:
+        self._log(logging.WARNING, msg, args)
+
+    def error(self, msg, *args) -> None:
+        self._log(logging.ERROR, msg, args)
+
+
+# Attribute records to the code calling the hot path logger, not to `_HotPathLog._log()`
+_STACKLEVEL = {"stacklevel": 3} if sys.version_info >= (3, 8) else {}
+
+
+class RateLimitedLog(_HotPathLog):
+    """Log at most `max_count` messages per `interval` seconds. The rest are dropped.
+
+    The first message logged after a window in which messages were dropped is preceded by a summary of how many.
+
+    ```
+    packet_log = ssc_log.RateLimitedLog(max_count=10, interval=1.0)
+    packet_log.debug("Received %d bytes from %s", len(data), address)
+    ```
+    """
+
+    def __init__(
+        self,
+        max_count: int,
+        interval: float = 1.0,
+        *,
+        logger: Union[logging.Logger, None] = None,
+    ) -> None:
+        super().__init__(logger)
+        self.max_count = max_count
+        self.interval = interval
+        self.suppressed_count = 0
+        self._window_end = 0.0
+        self._window_count = 0
+        self._window_suppressed = 0
+
+    def _allow(self, level: int, msg, args: tuple) -> bool:
+        now = time.monotonic()
+        if now >= self._window_end:
+            suppressed = self._window_suppressed
+            self._window_end = now + self.interval
+            self._window_count = 0
+            self._window_suppressed = 0
+            if suppressed:
+                self._summary = (
+                    level,
+                    "Rate limit: suppressed %d message(s) in %g second(s)",
+                    (suppressed, self.interval),
+                )
+        if self._window_count < self.max_count:
+            self._window_count += 1
+            return True
+        self._window_suppressed += 1
+        self.suppressed_count += 1
+        return False
+
+
+class SampledLog(_HotPathLog):
+    """Log only 1 of every `every` messages: the 1st, the `every + 1`th, and so on."""
+
+    def __init__(
+        self,
+        every: int,
+        *,
+        logger: Union[logging.Logger, None] = None,
+    ) -> None:
+        super().__init__(logger)
+        if every < 1:
+            raise ValueError(f"every must be at least 1, not {every!r}")
+        self.every = every
+        self._count = 0
+
+    def _allow(self, level: int, msg, args: tuple) -> bool:
+        count = self._count
+        self._count = count + 1
+        return count % self.every == 0
+
+
+class DeduplicatedLog(_HotPathLog):
+    """Collapse consecutive identical messages (same level, `msg` and `args`) into a "repeated K times" summary.
+
+    The summary is logged when a different message arrives, or on `flush()`. Messages are compared without being
+    formatted. (A callable `msg` is compared by identity, so pass the same function each time.)
+    """
+
+    def __init__(self, *, logger: Union[logging.Logger, None] = None) -> None:
+        super().__init__(logger)
+        self._last: Union[tuple, None] = None
+        self._repeats = 0
+
+    def _allow(self, level: int, msg, args: tuple) -> bool:
+        key = (level, msg, args)
+        if key == self._last:
+            self._repeats += 1
+            return False
+        if self._repeats:
+            self._summary = (self._last[0], "Previous message repeated %d more time(s)", (self._repeats,))
+            self._repeats = 0
+        self._last = key
+        return True
+
+    def flush(self) -> None:
+        """Log the summary for any repeats of the last message, and forget it."""
+        if self._repeats:
+            self.logger.log(self._last[0], "Previous message repeated %d more time(s)", self._repeats)
+            self._repeats = 0
+        self._last = None
+
+
 def getChild(name):
     return logger.getChild(name)
 
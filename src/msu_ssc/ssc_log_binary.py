@@ -0,0 +1,505 @@
+"""
+Compact binary log files, with a sparse time index for fast reads of a UTC time range.
+
+Enable with `ssc_log.init(binary_file_path=...)`. Read with `read_records()`, or export to JSONL at the command line:
+
+```
+python -m msu_ssc.ssc_log_binary export ssc.sscb --start 2025-02-03T12:00:00 --end 2025-02-03T12:05:00 -o out.jsonl
+```
+
+FILE FORMAT:
+- The file begins with `MAGIC`.
+- Then a sequence of entries, each a little-endian `uint32` length followed by that many bytes. The first byte of each
+  entry is its type:
+    - `CHECKPOINT`: Forget all interned strings. Every index entry points at one of these.
+    - `STRING`: Intern a string (logger names, message templates, file names, etc.) under the next integer id.
+    - `RECORD`: A log record, referring to interned strings by id.
+- The index is a separate file (`<path>.idx`) of fixed-size `(created_ns, offset)` pairs, one per checkpoint.
+  Checkpoints are written at most once per `checkpoint_interval` seconds, so the index stays small.
+
+Message templates are only interned when the record has `%`-style args that are all `None`/`bool`/`int`/`float`/`str`.
+Otherwise (e.g., f-strings), the rendered message is stored inline, so the intern table doesn't fill with one-off
+strings.
+"""
+
+import bisect
+import datetime
+import json
+import logging
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import BinaryIO
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+from typing import Union
+
+from msu_ssc import time_util
+
+MAGIC = b"SSCLOGB\x01"
+
+CHECKPOINT = 0
+STRING = 1
+RECORD = 2
+
+_LENGTH = struct.Struct("<I")
+_CHECKPOINT = struct.Struct("<Bq")
+_STRING_HEADER = struct.Struct("<B")
+_RECORD_HEADER = struct.Struct("<BqHIIIIIB")
+_INDEX_ENTRY = struct.Struct("<qQ")
+_ID = struct.Struct("<I")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+# RECORD flags
+_TEMPLATED = 0x01
+_HAS_EXC_TEXT = 0x02
+
+# Arg tags
+_ARG_NONE = 0
+_ARG_FALSE = 1
+_ARG_TRUE = 2
+_ARG_INT = 3
+_ARG_FLOAT = 4
+_ARG_STR = 5
+
+_INT_MIN = -(2**63)
+_INT_MAX = 2**63 - 1
+
+
+def index_path(path: Union[Path, str]) -> Path:
+    """The index file that goes with the binary log at `path`. A compressed segment keeps its uncompressed index, so
+    `ssc_2025-02-03T12_00_00.sscb.gz` goes with `ssc_2025-02-03T12_00_00.sscb.idx`."""
+    path = Path(path)
+    name = path.name
+    if name.endswith((".gz", ".xz")):
+        name = name[:-3]
+    return path.with_name(name + ".idx")
+
+
+def _open(path: Union[Path, str]) -> BinaryIO:
+    name = str(path)
+    if name.endswith(".gz"):
+        import gzip
+
+        return gzip.open(path, "rb")
+    if name.endswith(".xz"):
+        import lzma
+
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+
+def _encode_str(string: str) -> bytes:
+    encoded = string.encode("utf-8", errors="backslashreplace")
+    return _ID.pack(len(encoded)) + encoded
+
+
+def _encode_args(args: tuple) -> Union[bytes, None]:
+    """Encode `%`-style args, or `None` if any arg isn't a simple type."""
+    parts = [_ID.pack(len(args))]
+    for arg in args:
+        arg_type = type(arg)
+        if arg is None:
+            parts.append(bytes((_ARG_NONE,)))
+        elif arg_type is bool:
+            parts.append(bytes((_ARG_TRUE if arg else _ARG_FALSE,)))
+        elif arg_type is int and _INT_MIN <= arg <= _INT_MAX:
+            parts.append(bytes((_ARG_INT,)) + _INT.pack(arg))
+        elif arg_type is float:
+            parts.append(bytes((_ARG_FLOAT,)) + _FLOAT.pack(arg))
+        elif arg_type is str:
+            parts.append(bytes((_ARG_STR,)) + _encode_str(arg))
+        else:
+            return None
+    return b"".join(parts)
+
+
+class BinaryLogHandler(logging.Handler):
+    """Write records to a compact binary log file (see module docstring for the format).
+
+    The file is APPENDED. The stream is flushed at every checkpoint, for records at `flush_level` or above, and on
+    close, rather than on every record.
+
+    `rotate_bytes`, `rotate_interval`, `compression` and `retention_bytes` rotate the file the way
+    `ssc_log.RotatingUtcFileHandler` does, except that the size is checked before each record is written, so a
+    segment can run one record over `rotate_bytes`. Each segment is a complete binary log with its own index, like
+    `ssc_2025-02-03T12_00_00.sscb` and `ssc_2025-02-03T12_00_00.sscb.idx`. Indexes are never compressed, and are
+    deleted along with their segments, but don't count towards `retention_bytes`.
+    """
+
+    def __init__(
+        self,
+        filename: Union[Path, str],
+        *,
+        checkpoint_interval: float = 1.0,
+        flush_level: int = logging.WARNING,
+        rotate_bytes: Union[int, None] = None,
+        rotate_interval: Union[datetime.timedelta, None] = None,
+        compression: Union[str, None] = None,
+        retention_bytes: Union[int, None] = None,
+    ) -> None:
+        super().__init__()
+        self.path = Path(filename).expanduser().resolve()
+        self.checkpoint_interval_ns = int(checkpoint_interval * 1e9)
+        self.flush_level = flush_level
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval_seconds = rotate_interval.total_seconds() if rotate_interval else None
+        if self.rotate_interval_seconds is not None and self.rotate_interval_seconds <= 0:
+            raise ValueError(f"rotate_interval must be positive, not {rotate_interval!r}")
+
+        self._archiver = None
+        if any(value is not None for value in (rotate_bytes, rotate_interval, compression, retention_bytes)):
+            from msu_ssc import ssc_log
+
+            self._namer = ssc_log._SegmentNamer(self.path, sidecar_suffixes=(".idx",))
+            self._archiver = ssc_log._SegmentArchiver(
+                compression=compression,
+                retention_bytes=retention_bytes,
+                namer=self._namer,
+            )
+        self._open()
+        self._start_segment(time.time())
+
+    def _open(self) -> None:
+        self._stream: BinaryIO = open(self.path, "ab")
+        self._index_stream: BinaryIO = open(index_path(self.path), "ab")
+        if self._stream.tell() == 0:
+            self._stream.write(MAGIC)
+        self._strings: Dict[str, int] = {}
+        self._next_checkpoint_ns = _INT_MIN
+
+    def _start_segment(self, now: float) -> None:
+        self._segment_start = now
+        if self.rotate_interval_seconds is not None:
+            self._next_boundary = (now // self.rotate_interval_seconds + 1) * self.rotate_interval_seconds
+        else:
+            self._next_boundary = float("inf")
+
+    def do_rollover(self, now: Union[float, None] = None) -> None:
+        """Finish the current segment and its index, hand them to the background archiver, and begin a new one.
+
+        Does nothing if the handler was made without any rotation options.
+        """
+        if self._archiver is None:
+            return
+        self._stream.close()
+        self._index_stream.close()
+        if self.path.stat().st_size > len(MAGIC):
+            segment_path = self._namer.path(self._segment_start)
+            os.replace(index_path(self.path), index_path(segment_path))
+            os.replace(self.path, segment_path)
+            self._archiver.submit(segment_path)
+        self._open()
+        self._start_segment(time.time() if now is None else now)
+
+    def _intern(self, string: str, parts: List[bytes]) -> int:
+        try:
+            return self._strings[string]
+        except KeyError:
+            string_id = self._strings[string] = len(self._strings)
+            body = _STRING_HEADER.pack(STRING) + _encode_str(string)
+            parts.append(_LENGTH.pack(len(body)))
+            parts.append(body)
+            return string_id
+
+    def _checkpoint(self, created_ns: int) -> None:
+        self._strings.clear()
+        offset = self._stream.tell()
+        body = _CHECKPOINT.pack(CHECKPOINT, created_ns)
+        self._stream.write(_LENGTH.pack(len(body)) + body)
+        self._stream.flush()
+        self._index_stream.write(_INDEX_ENTRY.pack(created_ns, offset))
+        self._index_stream.flush()
+        self._next_checkpoint_ns = created_ns + self.checkpoint_interval_ns
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self._archiver is not None and (
+                record.created >= self._next_boundary
+                or (self.rotate_bytes is not None and self._stream.tell() >= self.rotate_bytes)
+            ):
+                self.do_rollover(record.created)
+            created_ns = round(record.created * 1e9)
+            if created_ns >= self._next_checkpoint_ns:
+                self._checkpoint(created_ns)
+
+            parts: List[bytes] = []
+            intern = self._intern
+            flags = 0
+            message_part = None
+            if record.args and isinstance(record.args, tuple) and isinstance(record.msg, str):
+                encoded_args = _encode_args(record.args)
+                if encoded_args is not None:
+                    flags |= _TEMPLATED
+                    message_part = _ID.pack(intern(record.msg, parts)) + encoded_args
+            if message_part is None:
+                message_part = _encode_str(record.getMessage())
+
+            exc_part = b""
+            if record.exc_info and not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            if record.exc_text:
+                flags |= _HAS_EXC_TEXT
+                exc_part = _encode_str(record.exc_text)
+
+            header = _RECORD_HEADER.pack(
+                RECORD,
+                created_ns,
+                record.levelno,
+                intern(record.name, parts),
+                intern(record.pathname, parts),
+                intern(record.funcName or "", parts),
+                intern(record.threadName or "", parts),
+                record.lineno,
+                flags,
+            )
+            body = header + message_part + exc_part
+            parts.append(_LENGTH.pack(len(body)))
+            parts.append(body)
+            self._stream.write(b"".join(parts))
+            if record.levelno >= self.flush_level:
+                self._stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            # Strings may have been interned without being written. Start over at a fresh checkpoint.
+            self._next_checkpoint_ns = _INT_MIN
+            self.handleError(record)
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self._stream.closed:
+                self._stream.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self._stream.close()
+            self._index_stream.close()
+        if self._archiver is not None:
+            self._archiver.join()
+        super().close()
+
+
+class BinaryLogRecord(NamedTuple):
+    created_ns: int
+    levelno: int
+    name: str
+    message: str
+    pathname: str
+    lineno: int
+    funcName: str
+    threadName: str
+    exc_text: Union[str, None]
+
+    @property
+    def created(self) -> float:
+        return self.created_ns / 1e9
+
+    @property
+    def levelname(self) -> str:
+        return logging.getLevelName(self.levelno)
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """UTC time of the record, as a timezone-aware `datetime`."""
+        return datetime.datetime.fromtimestamp(self.created, tz=datetime.timezone.utc)
+
+    def to_dict(self) -> dict:
+        data = {
+            "message": self.message,
+            "name": self.name,
+            "levelname": self.levelname,
+            "created": self.created,
+            "timestamp": self.timestamp.isoformat(),
+            "pathname": self.pathname,
+            "lineno": self.lineno,
+            "funcName": self.funcName,
+            "threadName": self.threadName,
+        }
+        if self.exc_text:
+            data["exc_info"] = self.exc_text
+        return data
+
+
+def _to_ns(timestamp: Union[datetime.datetime, float, None]) -> Union[int, None]:
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, datetime.datetime):
+        if timestamp.tzinfo is None:
+            raise ValueError("Timestamps must be timezone-aware. Use `tzinfo=datetime.timezone.utc` for UTC.")
+        timestamp = timestamp.timestamp()
+    return round(timestamp * 1e9)
+
+
+def read_index(path: Union[Path, str]) -> List[Tuple[int, int]]:
+    """The `(created_ns, offset)` checkpoints of the binary log at `path`. Empty if there is no index."""
+    try:
+        data = index_path(path).read_bytes()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % _INDEX_ENTRY.size
+    return list(_INDEX_ENTRY.iter_unpack(data[:usable]))
+
+
+def _decode_str(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = _ID.unpack_from(data, offset)
+    offset += _ID.size
+    return data[offset : offset + length].decode("utf-8"), offset + length
+
+
+def _decode_args(data: bytes, offset: int) -> Tuple[tuple, int]:
+    (count,) = _ID.unpack_from(data, offset)
+    offset += _ID.size
+    args = []
+    for _ in range(count):
+        tag = data[offset]
+        offset += 1
+        if tag == _ARG_NONE:
+            args.append(None)
+        elif tag == _ARG_FALSE:
+            args.append(False)
+        elif tag == _ARG_TRUE:
+            args.append(True)
+        elif tag == _ARG_INT:
+            args.append(_INT.unpack_from(data, offset)[0])
+            offset += _INT.size
+        elif tag == _ARG_FLOAT:
+            args.append(_FLOAT.unpack_from(data, offset)[0])
+            offset += _FLOAT.size
+        elif tag == _ARG_STR:
+            string, offset = _decode_str(data, offset)
+            args.append(string)
+        else:
+            raise ValueError(f"Unknown arg tag {tag}")
+    return tuple(args), offset
+
+
+def read_records(
+    path: Union[Path, str],
+    start: Union[datetime.datetime, float, None] = None,
+    end: Union[datetime.datetime, float, None] = None,
+    *,
+    slack: float = 1.0,
+) -> Iterator[BinaryLogRecord]:
+    """Yield the records in the binary log at `path`, optionally only those from `start` up to (not including) `end`.
+
+    `start` and `end` are timezone-aware `datetime`s or POSIX timestamps. The index is used to seek straight to the
+    last checkpoint before `start`. Records from different threads can be written slightly out of time order, so
+    reading begins `slack` seconds before `start`, and continues until a record is more than `slack` seconds
+    past `end`. `path` may be a gzip or xz compressed segment.
+    """
+    start_ns = _to_ns(start)
+    end_ns = _to_ns(end)
+    slack_ns = round(slack * 1e9)
+
+    offset = len(MAGIC)
+    if start_ns is not None:
+        checkpoints = read_index(path)
+        position = bisect.bisect_right(checkpoints, (start_ns - slack_ns, 2**64)) - 1
+        if position >= 0:
+            offset = checkpoints[position][1]
+
+    strings: List[str] = []
+    with _open(path) as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an ssc binary log file")
+        file.seek(offset)
+        while True:
+            length_bytes = file.read(_LENGTH.size)
+            if len(length_bytes) < _LENGTH.size:
+                return
+            (length,) = _LENGTH.unpack(length_bytes)
+            body = file.read(length)
+            if len(body) < length:
+                # Truncated final entry, e.g. from a crash
+                return
+
+            entry_type = body[0]
+            if entry_type == CHECKPOINT:
+                strings.clear()
+            elif entry_type == STRING:
+                strings.append(_decode_str(body, 1)[0])
+            elif entry_type == RECORD:
+                (_, created_ns, levelno, name_id, path_id, func_id, thread_id, lineno, flags) = (
+                    _RECORD_HEADER.unpack_from(body)
+                )
+                if end_ns is not None and created_ns >= end_ns + slack_ns:
+                    return
+                if (start_ns is not None and created_ns < start_ns) or (end_ns is not None and created_ns >= end_ns):
+                    continue
+
+                position = _RECORD_HEADER.size
+                if flags & _TEMPLATED:
+                    (template_id,) = _ID.unpack_from(body, position)
+                    args, position = _decode_args(body, position + _ID.size)
+                    try:
+                        message = strings[template_id] % args
+                    except (TypeError, ValueError):
+                        message = f"{strings[template_id]} {args!r}"
+                else:
+                    message, position = _decode_str(body, position)
+                exc_text = _decode_str(body, position)[0] if flags & _HAS_EXC_TEXT else None
+
+                yield BinaryLogRecord(
+                    created_ns=created_ns,
+                    levelno=levelno,
+                    name=strings[name_id],
+                    message=message,
+                    pathname=strings[path_id],
+                    lineno=lineno,
+                    funcName=strings[func_id],
+                    threadName=strings[thread_id],
+                    exc_text=exc_text,
+                )
+            else:
+                raise ValueError(f"Unknown entry type {entry_type} in {path}")
+
+
+def export_jsonl(
+    path: Union[Path, str],
+    output,
+    start: Union[datetime.datetime, float, None] = None,
+    end: Union[datetime.datetime, float, None] = None,
+) -> int:
+    """Write the records of the binary log at `path` to the text stream `output`, one JSON object per line.
+
+    Returns:
+        int: The number of records written.
+    """
+    count = 0
+    for record in read_records(path, start=start, end=end):
+        output.write(json.dumps(record.to_dict()) + "\n")
+        count += 1
+    return count
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Work with ssc binary log files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export records to JSONL")
+    export_parser.add_argument("path", help="Binary log file")
+    export_parser.add_argument("--start", type=time_util.parse_utc, help="ISO 8601 time. Naive times are taken as UTC")
+    export_parser.add_argument("--end", type=time_util.parse_utc, help="ISO 8601 time. Naive times are taken as UTC")
+    export_parser.add_argument("--output", "-o", help="Output JSONL file. Default is stdout")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output:
+                export_jsonl(args.path, output, start=args.start, end=args.end)
+        else:
+            export_jsonl(args.path, sys.stdout, start=args.start, end=args.end)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,10 @@
 import datetime
+import threading
+import time
+
+_monotonic_ns = time.monotonic_ns
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
 
 
 def utc() -> datetime.datetime:
@@ -11,3 +17,128 @@ def utc() -> datetime.datetime:
         datetime.datetime: A timezone-aware datetime object
     """
     return datetime.datetime.now(tz=datetime.timezone.utc)
+
+
+def ns_to_utc(nanoseconds: int) -> datetime.datetime:
+    """Convert nanoseconds since the POSIX epoch to a timezone-aware UTC `datetime`, truncated to microseconds."""
+    return _EPOCH + datetime.timedelta(microseconds=nanoseconds // 1000)
+
+
+def parse_utc(string: str) -> datetime.datetime:
+    """Parse an ISO 8601 time to a timezone-aware `datetime`. Naive times are taken as UTC."""
+    timestamp = datetime.datetime.fromisoformat(string)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp
+
+
+class MonotonicClock:
+    """
+    A wall clock that is read once and then advanced with `time.monotonic_ns()`.
+
+    `time_ns()` costs little more than `time.monotonic_ns()` and much less than `utc()`, so it is meant for per-packet
+    and per-record timestamps. Keep the integer, and only convert it (`ns_to_utc()`) when it is displayed.
+
+    Unlike `time.time_ns()`, it never jumps when NTP steps the system clock. Every `reanchor_interval` seconds (or on
+    the first read after that, if it sits unread) it is compared against the system clock, and up to `max_correction`
+    seconds of the difference is slewed in gradually over the next interval. So it follows the system clock's
+    long-term rate without ever jumping or going backwards. `drift_ns` is the most recently measured difference
+    (system clock minus this clock).
+
+    Steps are never taken on their own: a large difference, like a 1 second NTP step, is slewed in at `max_correction`
+    per interval (100 intervals, for the defaults). Call `reanchor(step=True)` to jump to the system clock instead, at
+    a moment when a discontinuity is acceptable, such as before starting a pass.
+    """
+
+    def __init__(
+        self,
+        *,
+        reanchor_interval: float = 60.0,
+        max_correction: float = 0.01,
+    ) -> None:
+        if not 0 <= max_correction < reanchor_interval:
+            raise ValueError("max_correction must be between 0 and reanchor_interval, or the clock could go backwards")
+        self.reanchor_interval_ns = int(reanchor_interval * 1e9)
+        self.max_correction_ns = int(max_correction * 1e9)
+        self.drift_ns = 0
+        self._lock = threading.Lock()
+        wall_ns, monotonic_ns = self._sample()
+        # (wall ns, monotonic ns, correction ns to slew in over the interval) in a single tuple, so that readers never
+        # see parts of two different anchors
+        self._anchor = (wall_ns, monotonic_ns, 0)
+        self._next_reanchor_ns = monotonic_ns + self.reanchor_interval_ns
+
+    @staticmethod
+    def _sample():
+        # Bracket the wall clock reading between two monotonic readings, and keep the tightest of a few tries
+        best = None
+        for _ in range(3):
+            before = _monotonic_ns()
+            wall_ns = time.time_ns()
+            after = _monotonic_ns()
+            if best is None or after - before < best[0]:
+                best = (after - before, wall_ns, (before + after) // 2)
+        return best[1], best[2]
+
+    def _at(self, monotonic_ns: int) -> int:
+        wall_ns, anchor_monotonic_ns, correction_ns = self._anchor
+        elapsed_ns = monotonic_ns - anchor_monotonic_ns
+        # The correction is spread over one interval, however long it is before the next re-anchor
+        return (
+            wall_ns
+            + elapsed_ns
+            + correction_ns * min(elapsed_ns, self.reanchor_interval_ns) // self.reanchor_interval_ns
+        )
+
+    def time_ns(self) -> int:
+        """The current UTC time, in integer nanoseconds since the POSIX epoch."""
+        monotonic_ns = _monotonic_ns()
+        if monotonic_ns >= self._next_reanchor_ns:
+            self._reanchor(force=False)
+        # Inlined `_at()`, since this is the hot path
+        wall_ns, anchor_monotonic_ns, correction_ns = self._anchor
+        if correction_ns:
+            elapsed_ns = monotonic_ns - anchor_monotonic_ns
+            interval_ns = self.reanchor_interval_ns
+            return wall_ns + elapsed_ns + correction_ns * min(elapsed_ns, interval_ns) // interval_ns
+        return wall_ns + monotonic_ns - anchor_monotonic_ns
+
+    def time(self) -> float:
+        """The current UTC time, in seconds since the POSIX epoch, like `time.time()`."""
+        return self.time_ns() / 1e9
+
+    def utc(self) -> datetime.datetime:
+        """The current UTC time as a timezone-aware `datetime`, like `utc()`."""
+        return ns_to_utc(self.time_ns())
+
+    def reanchor(self, step: bool = False) -> int:
+        """Compare against the system clock now, rather than waiting for `reanchor_interval`. Returns `drift_ns`.
+
+        If `step`, jump straight to the system clock rather than slewing. The clock can go backwards when it does.
+        """
+        return self._reanchor(force=True, step=step)
+
+    def _reanchor(self, *, force: bool, step: bool = False) -> int:
+        with self._lock:
+            wall_ns, monotonic_ns = self._sample()
+            if not force and monotonic_ns < self._next_reanchor_ns:
+                # Another thread got here first
+                return self.drift_ns
+            ours_ns = self._at(monotonic_ns)
+            self.drift_ns = wall_ns - ours_ns
+            if step:
+                self._anchor = (wall_ns, monotonic_ns, 0)
+            else:
+                correction_ns = max(-self.max_correction_ns, min(self.max_correction_ns, self.drift_ns))
+                self._anchor = (ours_ns, monotonic_ns, correction_ns)
+            self._next_reanchor_ns = monotonic_ns + self.reanchor_interval_ns
+            return self.drift_ns
+
+
+# The shared clock for timestamps that should be cheap and monotonic: metrics, captures and logs
+clock = MonotonicClock()
+
+
+def utc_ns() -> int:
+    """The current UTC time in integer nanoseconds since the POSIX epoch, from the shared `clock`."""
+    return clock.time_ns()
@@ -6,6 +6,7 @@ from typing import Tuple
 from typing import Union
 
 from msu_ssc import ssc_log
+from msu_ssc import time_util
 
 # logger = create_logger(__file__, level="DEBUG")
 
@@ -27,6 +28,9 @@ def _shutdown_socket(sock: socket.socket):
 
 
 class UdpMux:
+    packet_log_max_per_second: int = 100
+    """Per-packet DEBUG messages beyond this many per second are dropped (with a summary of how many)."""
+
     def __init__(
         self,
         receive_socket_tuple: Tuple[str, int],
@@ -48,6 +52,8 @@ class UdpMux:
         self._received_bytes_count = 0
         self._transmitted_packet_count = 0
         self._transmitted_bytes_count = 0
+        self._last_packet_ns = 0
+        self._packet_log = ssc_log.RateLimitedLog(max_count=self.packet_log_max_per_second, interval=1.0)
 
         self.thread = threading.Thread(
             name=f"udp-mux-{_tup_to_str(self.receive_socket_tuple)}",
@@ -57,19 +63,26 @@ class UdpMux:
 
         self.thread.start()
 
+    @property
+    def last_packet_time(self) -> Union[datetime.datetime, None]:
+        """When the last packet was received (UTC), or `None` if none has been."""
+        return time_util.ns_to_utc(self._last_packet_ns) if self._last_packet_ns else None
+
     def start_mux(self) -> None:
         ssc_log.info(f"Beginning MUX setup")
         self.bind()
-        self._mux_start_time = datetime.datetime.now(tz=datetime.timezone.utc)
+        self._mux_start_ns = time_util.clock.time_ns()
+        self._mux_start_time = time_util.ns_to_utc(self._mux_start_ns)
         ssc_log.info(f"Ready to begin muxing at {self._mux_start_time.isoformat(timespec='seconds', sep=' ')}.")
         while True:
             data, source_address = self.receive_socket.recvfrom(4096)
             self.handle_packet(data, source_address)
 
     def stop_mux(self) -> None:
-        self._mux_stop_time = datetime.datetime.now(tz=datetime.timezone.utc)
+        stop_ns = time_util.clock.time_ns()
+        self._mux_stop_time = time_util.ns_to_utc(stop_ns)
         try:
-            elapsed = (self._mux_stop_time - self._mux_start_time).total_seconds()
+            elapsed = (stop_ns - self._mux_start_ns) / 1e9
         except Exception:
             elapsed = 0
         ssc_log.info(
@@ -80,7 +93,8 @@ class UdpMux:
             _shutdown_socket(self.transmit_socket)
         ssc_log.debug(
             f"Received {self._received_packet_count} packets ({self._received_bytes_count} bytes). "
-            + f"Transmitted {self._transmitted_packet_count} packets ({self._transmitted_bytes_count} bytes)."
+            + f"Transmitted {self._transmitted_packet_count} packets ({self._transmitted_bytes_count} bytes). "
+            + f"Last packet received at {self.last_packet_time}."
         )
 
     def bind(self) -> None:
@@ -106,13 +120,16 @@ class UdpMux:
         self._bound = True
 
     def handle_packet(self, payload_data: bytes, source_address=None) -> None:
+        self._last_packet_ns = time_util.clock.time_ns()
         self._received_packet_count += 1
         self._received_bytes_count += len(payload_data)
-        ssc_log.debug(f"Received {len(payload_data):,} bytes from {_tup_to_str(source_address)}")
+        packet_log = self._packet_log
+        # Callables, so the `,` thousands separators are only formatted for messages that are logged
+        packet_log.debug(lambda: f"Received {len(payload_data):,} bytes from {_tup_to_str(source_address)}")
         for transmit_socket_tuple in self.transmit_socket_tuples:
             attempted_transmitted_data_size = len(payload_data)
-            ssc_log.debug(
-                f"  Sending {attempted_transmitted_data_size:,} bytes to {_tup_to_str(transmit_socket_tuple)}"
+            packet_log.debug(
+                lambda: f"  Sending {attempted_transmitted_data_size:,} bytes to {_tup_to_str(transmit_socket_tuple)}"
             )
             actual_transmitted_data_size = self.transmit_socket.sendto(payload_data, transmit_socket_tuple)
             if actual_transmitted_data_size != attempted_transmitted_data_size:
@@ -168,6 +185,11 @@ def main() -> int:
             + "This will cause the source port of the retransmitted packets to be the same as if the packet never passed through this muxer.",
         ),
     )
+    parser.add_argument(
+        "--profiler-port",
+        type=int,
+        help="Serve sampling profiler commands on this localhost UDP port (see `python -m msu_ssc.profiler`)",
+    )
     args = parser.parse_args()
     receive_socket_tuple = _str_to_tup(args.receive)
     transmit_socket_tuples = [_str_to_tup(sock_str) for sock_str in args.transmit]
@@ -175,6 +197,10 @@ def main() -> int:
     ssc_log.debug(f"Parsed receive UDP socket: {receive_socket_tuple!r}")
     ssc_log.debug(f"Parsed transmit UCP socket(s): {transmit_socket_tuples!r}")
 
+    from msu_ssc import profiler
+
+    profiler.enable_profiler_control(port=args.profiler_port)
+
     with UdpMux(
         receive_socket_tuple=receive_socket_tuple,
         transmit_socket_tuples=transmit_socket_tuples,
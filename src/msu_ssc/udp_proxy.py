@@ -1,3 +1,4 @@
+import datetime
 import socket
 import threading
 from typing import Tuple
@@ -6,7 +7,7 @@ from typing import TypeAlias
 from typing import Union
 
 from msu_ssc import ssc_log
-from msu_ssc.time_util import utc
+from msu_ssc import time_util
 from msu_ssc.udp_mux import _shutdown_socket
 from msu_ssc.udp_mux import _tup_to_str
 
@@ -14,6 +15,12 @@ IPv4SockTup: TypeAlias = Tuple[str, int]
 
 
 class OneWayUdpProxyThread(threading.Thread):
+    packet_log_max_per_second: int = 100
+    """Per-packet DEBUG messages beyond this many per second are dropped (with a summary of how many)."""
+
+    thread_name_prefix: str = "udp-proxy-"
+    """Every thread's name starts with this, so tools like `msu_ssc.profiler` can pick out proxy threads."""
+
     def __init__(
         self,
         *,
@@ -24,7 +31,7 @@ class OneWayUdpProxyThread(threading.Thread):
         name: str = "proxy",
         **kwargs,
     ):
-        name += f"({_tup_to_str(proxy_tup)}->{_tup_to_str(destination_tup)})"
+        name = f"{self.thread_name_prefix}{name}({_tup_to_str(proxy_tup)}->{_tup_to_str(destination_tup)})"
 
         super().__init__(
             name=name,
@@ -38,6 +45,13 @@ class OneWayUdpProxyThread(threading.Thread):
 
         self.total_packets = 0
         self.total_bytes = 0
+        self._last_packet_ns = 0
+        self._packet_log = ssc_log.RateLimitedLog(max_count=self.packet_log_max_per_second, interval=1.0)
+
+    @property
+    def last_packet_time(self) -> Union[datetime.datetime, None]:
+        """When the last packet was received (UTC), or `None` if none has been."""
+        return time_util.ns_to_utc(self._last_packet_ns) if self._last_packet_ns else None
 
     # def target
 
@@ -50,7 +64,7 @@ class OneWayUdpProxyThread(threading.Thread):
         ssc_log.info(f"Successfully bound receiving socket {_tup_to_str(self.proxy_tup)}. [{self.name}]")
 
         # SERVE FOREVER
-        self._mux_start_time = utc()
+        self._mux_start_time = time_util.clock.utc()
         ssc_log.info(
             f"Ready to begin proxying at {self._mux_start_time.isoformat(timespec='seconds', sep=' ')}. [{self.name}]"
         )
@@ -69,7 +83,7 @@ class OneWayUdpProxyThread(threading.Thread):
         **kwargs,
     ):
         """Overload this one."""
-        ssc_log.debug(f"sending {len(data)} to {_tup_to_str(destination_tup)} [{self.name}]")
+        self._packet_log.debug("sending %d to %s:%s [%s]", len(data), destination_tup[0], destination_tup[1], self.name)
         self.proxy_socket.sendto(data, destination_tup)
 
     def _receive_packet(
@@ -79,15 +93,26 @@ class OneWayUdpProxyThread(threading.Thread):
         source_address: Union[IPv4SockTup, None] = None,
         debug: bool = True,
     ) -> None:
+        self._last_packet_ns = time_util.clock.time_ns()
         if debug:
-            message = f"Received {len(data)} bytes"
             if source_address:
-                message += f" from {_tup_to_str(source_address)}."
+                self._packet_log.debug(
+                    "Received %d bytes from %s:%s. (total: %d packets; %d bytes) [%s]",
+                    len(data),
+                    source_address[0],
+                    source_address[1],
+                    self.total_packets,
+                    self.total_bytes,
+                    self.name,
+                )
             else:
-                message += "."
-            message += f" (total: {self.total_packets} packets; {self.total_bytes} bytes) "
-            message += f"[{self.name}]"
-            ssc_log.debug(message)
+                self._packet_log.debug(
+                    "Received %d bytes. (total: %d packets; %d bytes) [%s]",
+                    len(data),
+                    self.total_packets,
+                    self.total_bytes,
+                    self.name,
+                )
 
         self.handle_packet(
             data=data,
@@ -143,9 +168,9 @@ class OneWayUdpProxyThreadFailure(OneWayUdpProxyThread):
 
     def handle_packet(self, *, data: bytes, destination_tup: IPv4SockTup, **kwargs):
         if self.total_packets % 2 == 0:
-            ssc_log.info(f"INTENTIONAL FAILURE. packet index: {self.total_packets} [{self.name}]")
+            self._packet_log.info("INTENTIONAL FAILURE. packet index: %d [%s]", self.total_packets, self.name)
         else:
-            ssc_log.debug(f"Sending packet normally [{self.name}]")
+            self._packet_log.debug("Sending packet normally [%s]", self.name)
             self.proxy_socket.sendto(data, destination_tup)
 
 
@@ -156,6 +181,10 @@ class BidirectionalUdpProxyFailure(BidirectionalUdpProxy):
 if __name__ == "__main__":
     import time
 
+    from msu_ssc import profiler
+
+    profiler.enable_profiler_control()
+
     proxy_class = BidirectionalUdpProxy
     # proxy_class = BidirectionalUdpProxyFailure
 
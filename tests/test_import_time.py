@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Cumulative import time budgets, in microseconds, for `python -X importtime`. Generous, since CI machines vary.
+IMPORT_TIME_BUDGETS_US = {
+    "msu_ssc.ssc_log": 50_000,
+    "msu_ssc.udp_mux": 100_000,
+}
+
+# Only needed once logging is configured, so must not be imported by `import msu_ssc.udp_mux`
+DEFERRED_MODULES = (
+    "rich",
+    "pythonjsonlogger",
+    "logging.handlers",
+    "json",
+)
+
+
+def _import_times(module: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, (str(Path(__file__).parent.parent / "src"), env.get("PYTHONPATH")))
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative)
+        except ValueError:
+            # The header line
+            continue
+    return times
+
+
+@pytest.fixture(scope="module")
+def udp_mux_import_times() -> dict:
+    return _import_times("msu_ssc.udp_mux")
+
+
+def test_deferred_modules_not_imported(udp_mux_import_times):
+    assert "msu_ssc.ssc_log" in udp_mux_import_times
+    for module in DEFERRED_MODULES:
+        assert module not in udp_mux_import_times
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_TIME_BUDGETS_US))
+def test_import_time_budget(udp_mux_import_times, module):
+    assert udp_mux_import_times[module] <= IMPORT_TIME_BUDGETS_US[module]
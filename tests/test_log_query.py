@@ -0,0 +1,69 @@
+import datetime
+import gzip
+import logging
+
+from msu_ssc import log_query
+from msu_ssc import ssc_log
+
+base_time = datetime.datetime(2025, 1, 2, 3, 0, 0, tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _write_logs(directory, name, count, offset=0.0):
+    plain_lines = []
+    jsonl_lines = []
+    jsonl_formatter = ssc_log.JsonLinesFormatter()
+    for index in range(count):
+        level = logging.WARNING if index % 10 == 0 else logging.INFO
+        logger_name = "ssc.mux" if index % 2 == 0 else "ssc.proxy"
+        record = logging.LogRecord(logger_name, level, __file__, index, f"{name} packet {index}", None, None)
+        record.created = base_time + offset + index
+        record.msecs = 0.0
+        plain_lines.append(ssc_log.PlainTextFormatter().format(record))
+        jsonl_lines.append(jsonl_formatter.format(record))
+    (directory / f"{name}.log").write_text("\n".join(plain_lines) + "\n")
+    (directory / f"{name}.jsonl").write_text("\n".join(jsonl_lines) + "\n")
+
+
+def test_query_plain_text_and_jsonl(tmp_path):
+    _write_logs(tmp_path, "a", 100)
+    query = log_query.LogQuery(min_levelno=logging.WARNING, start=base_time + 20, end=base_time + 50)
+
+    plain = list(log_query.query_file(tmp_path / "a.log", query))
+    assert [match.message for match in plain] == ["a packet 20", "a packet 30", "a packet 40"]
+    assert plain[0].line_number == 21
+    assert plain[0].created == base_time + 20
+
+    jsonl = list(log_query.query_file(tmp_path / "a.jsonl", query))
+    assert [match.message for match in jsonl] == ["a packet 20", "a packet 30", "a packet 40"]
+
+    query = log_query.LogQuery(logger="ssc.proxy", pattern=r"packet 9\d$")
+    assert [match.message for match in log_query.query_file(tmp_path / "a.jsonl", query)] == [
+        f"a packet {index}" for index in range(91, 100, 2)
+    ]
+    # Plain text doesn't record the logger
+    assert list(log_query.query_file(tmp_path / "a.log", query)) == []
+
+
+def test_start_time_bisect_in_large_file(tmp_path):
+    _write_logs(tmp_path, "big", 20_000)
+    query = log_query.LogQuery(start=base_time + 15_000, end=base_time + 15_003)
+    assert [match.message for match in log_query.query_file(tmp_path / "big.log", query)] == [
+        "big packet 15000",
+        "big packet 15001",
+        "big packet 15002",
+    ]
+
+
+def test_query_files_merges_in_time_order(tmp_path):
+    _write_logs(tmp_path, "a", 50)
+    _write_logs(tmp_path, "b", 50, offset=0.5)
+    (tmp_path / "a.log.gz").write_bytes(gzip.compress((tmp_path / "a.log").read_bytes()))
+    (tmp_path / "a.log").unlink()
+
+    query = log_query.LogQuery(end=base_time + 3)
+    for processes in (1, 2):
+        matches = list(log_query.query_files([tmp_path], query, processes=processes))
+        assert [match.created for match in matches] == sorted(match.created for match in matches)
+        assert sorted(match.message for match in matches) == sorted(
+            [f"a packet {index}" for index in range(3)] * 2 + [f"b packet {index}" for index in range(3)] * 2
+        )
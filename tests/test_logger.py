@@ -1,6 +1,10 @@
 import datetime
+import logging
+import threading
+import time
 
 import freezegun
+import pytest
 
 from msu_ssc import ssc_log
 
@@ -39,3 +43,419 @@ def test_utc_filename_timestamp():
             )
             == "prefix_2025-01-02T03_45_56_suffix.txt"
         )
+
+
+def _record(msg: str) -> logging.LogRecord:
+    return logging.LogRecord("ssc", logging.INFO, __file__, 0, msg, None, None)
+
+
+def test_bounded_queue_handler_drop_newest():
+    handler = ssc_log.BoundedQueueHandler(maxsize=2, overflow="drop_newest")
+    for index in range(5):
+        handler.handle(_record(f"message {index}"))
+    assert handler.enqueued_count == 2
+    assert handler.dropped_count == 3
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ["message 0", "message 1"]
+
+
+def test_bounded_queue_handler_drop_oldest():
+    handler = ssc_log.BoundedQueueHandler(maxsize=2, overflow="drop_oldest")
+    for index in range(5):
+        handler.handle(_record(f"message {index}"))
+    assert handler.dropped_count == 3
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ["message 3", "message 4"]
+
+
+def test_queued_logging_flushes_on_shutdown(tmp_path):
+    log_path = tmp_path / "queued.log"
+    original_level = ssc_log.logger.level
+    try:
+        ssc_log.init("DEBUG", plain_text_file_path=log_path, console_level="CRITICAL", queued=True)
+        assert ssc_log._queue_listener is not None
+        for index in range(100):
+            ssc_log.debug(f"queued message {index}")
+    finally:
+        ssc_log.shutdown()
+        for handler in list(ssc_log.logger.handlers):
+            ssc_log.logger.removeHandler(handler)
+            if handler is not ssc_log.console_handler:
+                handler.close()
+        ssc_log.logger.setLevel(original_level)
+
+    assert ssc_log._queue_listener is None
+    lines = log_path.read_text().splitlines()
+    assert lines[-1].endswith("queued message 99")
+    assert sum("queued message" in line for line in lines) == 100
+
+
+class _SlowHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record):
+        time.sleep(0.001)
+        self.messages.append(record.getMessage())
+
+
+def test_queued_logging_shutdown_with_full_queue():
+    slow_handler = _SlowHandler()
+    original_handlers = list(ssc_log.logger.handlers)
+    original_level = ssc_log.logger.level
+    ssc_log.logger.handlers = [slow_handler]
+    ssc_log.logger.setLevel(logging.DEBUG)
+    try:
+        ssc_log._start_queued_logging(maxsize=50, overflow="block")
+        ssc_log._queue_handler.block_timeout = 10
+        for index in range(200):
+            ssc_log.debug(f"queued message {index}")
+        assert ssc_log._queue_handler.queue.full()
+        ssc_log.shutdown()
+        assert ssc_log.logger.handlers == [slow_handler]
+        ssc_log.debug("after shutdown")
+    finally:
+        ssc_log.shutdown()
+        ssc_log.logger.handlers = original_handlers
+        ssc_log.logger.setLevel(original_level)
+
+    assert slow_handler.messages == [f"queued message {index}" for index in range(200)] + ["after shutdown"]
+
+
+def _records():
+    records = [
+        logging.LogRecord("ssc", logging.INFO, "/a/b.py", 12, "hello %s", ("world",), None, func="f"),
+        logging.LogRecord("ssc.child", logging.DEBUG, "/a/b.py", 13, 'quote " and é', None, None),
+        logging.LogRecord("ssc", logging.WARNING, "/a/b.py", 14, "with extra", None, None),
+    ]
+    records[2].count = 3
+    records[2].ratio = float("nan")
+    records[2].payload = {b"abc"}
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        import sys
+
+        records.append(logging.LogRecord("ssc", logging.ERROR, "/a/b.py", 15, "failed", None, sys.exc_info()))
+    return records
+
+
+def test_plain_text_formatter_matches_stdlib():
+    reference = logging.Formatter(fmt=ssc_log.PlainTextFormatter.FORMAT, datefmt=ssc_log.PlainTextFormatter.DATEFMT)
+    for record in _records():
+        expected = reference.format(record)
+        record.exc_text = None
+        assert ssc_log.plain_text_formatter.format(record) == expected
+
+
+def test_jsonl_formatter_matches_pythonjsonlogger():
+    from pythonjsonlogger.jsonlogger import JsonFormatter
+
+    reference = JsonFormatter(reserved_attrs=("msg", "args", "levelno"))
+    formatter = ssc_log.JsonLinesFormatter()
+    for record in _records():
+        assert formatter.format(record) == reference.format(record)
+
+    # After the plain text formatter has added `asctime` to the record
+    record = _records()[0]
+    ssc_log.plain_text_formatter.format(record)
+    assert formatter.format(record) == reference.format(record)
+
+
+def test_iso_str():
+    timestamp = datetime.datetime(2025, 1, 2, 3, 45, 56, 123456)
+    assert ssc_log._iso_str(timestamp) == "[2025-01-02 03:45:56.123]"
+    assert ssc_log._iso_str(timestamp.replace(microsecond=999999)) == "[2025-01-02 03:45:56.999]"
+    assert ssc_log._iso_str(timestamp.replace(second=57, microsecond=0)) == "[2025-01-02 03:45:57.000]"
+
+
+def test_rotating_handler_rotates_compresses_and_prunes(tmp_path):
+    import gzip
+
+    log_path = tmp_path / "ssc.log"
+    handler = ssc_log.RotatingUtcFileHandler(log_path, rotate_bytes=1000, compression="gzip", retention_bytes=1000)
+    handler.setFormatter(ssc_log.plain_text_formatter)
+    base_time = datetime.datetime(2025, 1, 2, tzinfo=datetime.timezone.utc).timestamp()
+    try:
+        handler._start_segment(base_time)
+        for index in range(200):
+            record = _record(f"message {index:04d} " + "x" * 40)
+            record.created = base_time + index
+            handler.handle(record)
+    finally:
+        handler.close()
+
+    segments = sorted(tmp_path.glob("ssc_*.log.gz"))
+    assert segments
+    assert not list(tmp_path.glob("ssc_*.log"))
+    assert len(segments) < 10
+    assert sum(path.stat().st_size for path in segments) <= 1000
+
+    # The newest segment is kept, and ends right where the active file begins
+    newest = gzip.decompress(segments[-1].read_bytes()).decode().splitlines()
+    first_active = log_path.read_text().splitlines()[0]
+    assert int(newest[-1].split()[5]) + 1 == int(first_active.split()[5])
+
+
+def test_rotating_handler_keeps_segments_from_the_same_second(tmp_path):
+    import gzip
+
+    log_path = tmp_path / "ssc.log"
+    handler = ssc_log.RotatingUtcFileHandler(log_path, rotate_bytes=200, compression="gzip")
+    handler.setFormatter(ssc_log.plain_text_formatter)
+    base_time = datetime.datetime(2025, 1, 2, tzinfo=datetime.timezone.utc).timestamp()
+    try:
+        handler._start_segment(base_time)
+        for index in range(40):
+            record = _record(f"message {index:04d}")
+            record.created = base_time
+            handler.handle(record)
+    finally:
+        handler.close()
+
+    segments = list(tmp_path.glob("ssc_*.log.gz"))
+    assert len(segments) > 5
+    lines = [line for path in segments for line in gzip.decompress(path.read_bytes()).decode().splitlines()]
+    lines += log_path.read_text().splitlines()
+    assert sorted(line.split()[-1] for line in lines) == [f"{index:04d}" for index in range(40)]
+
+
+def test_rotating_handler_retention_ignores_other_logs(tmp_path):
+    other_paths = [tmp_path / "ssc_proxy.log", tmp_path / "ssc_proxy_2025-01-01T00_00_00.log"]
+    for path in other_paths:
+        path.write_text("x" * 5000)
+
+    log_path = tmp_path / "ssc.log"
+    handler = ssc_log.RotatingUtcFileHandler(log_path, rotate_bytes=200, retention_bytes=500)
+    handler.setFormatter(ssc_log.plain_text_formatter)
+    try:
+        for index in range(40):
+            handler.handle(_record(f"message {index:04d}"))
+    finally:
+        handler.close()
+
+    assert all(path.read_text() == "x" * 5000 for path in other_paths)
+    # Pruned to the retention limit, as of the last rotation
+    segments = list(tmp_path.glob("ssc_2*.log"))
+    assert 0 < len(segments) < 39 // 4
+    assert sum(path.stat().st_size for path in segments) <= 500
+
+
+def test_rotating_handler_without_suffix(tmp_path):
+    log_path = tmp_path / "mux"
+    handler = ssc_log.RotatingUtcFileHandler(log_path, rotate_bytes=100, retention_bytes=300)
+    handler.setFormatter(ssc_log.plain_text_formatter)
+    base_time = datetime.datetime(2025, 1, 2, tzinfo=datetime.timezone.utc).timestamp()
+    try:
+        handler._start_segment(base_time)
+        for index in range(60):
+            record = _record(f"message {index:04d}")
+            record.created = base_time + index
+            handler.handle(record)
+    finally:
+        handler.close()
+
+    segments = list(tmp_path.glob("mux_*"))
+    assert segments
+    assert not [path for path in segments if path.name.endswith(".")]
+    assert "mux_2025-01-02T00_00_00" not in [path.name for path in segments]
+    assert sum(path.stat().st_size for path in segments) <= 300
+
+
+def test_rotating_handler_rotates_on_utc_boundary(tmp_path):
+    log_path = tmp_path / "ssc.log"
+    handler = ssc_log.RotatingUtcFileHandler(log_path, rotate_interval=datetime.timedelta(hours=1))
+    handler.setFormatter(ssc_log.plain_text_formatter)
+    boundary = datetime.datetime(2025, 1, 2, 4, tzinfo=datetime.timezone.utc).timestamp()
+    try:
+        handler._start_segment(boundary - 90)
+        for offset in (-90, -30, 30):
+            record = _record(f"offset {offset}")
+            record.created = boundary + offset
+            handler.handle(record)
+    finally:
+        handler.close()
+
+    assert [path.name for path in tmp_path.glob("ssc_*")] == ["ssc_2025-01-02T03_58_30.log"]
+    assert log_path.read_text().count("offset") == 1
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _hot_path_logger(name):
+    hot_logger = logging.getLogger(f"ssc.test_hot_path.{name}")
+    hot_logger.setLevel(logging.DEBUG)
+    hot_logger.propagate = False
+    handler = _ListHandler()
+    hot_logger.handlers = [handler]
+    return hot_logger, handler
+
+
+def test_rate_limited_log():
+    hot_logger, handler = _hot_path_logger("rate")
+    rate_limited = ssc_log.RateLimitedLog(max_count=3, interval=3600, logger=hot_logger)
+    for index in range(10):
+        rate_limited.debug("packet %d", index)
+    assert handler.messages == ["packet 0", "packet 1", "packet 2"]
+    assert rate_limited.suppressed_count == 7
+
+    rate_limited._window_end = 0.0
+    rate_limited.debug("packet %d", 10)
+    assert handler.messages[-2:] == ["Rate limit: suppressed 7 message(s) in 3600 second(s)", "packet 10"]
+
+    with pytest.raises(TypeError):
+        ssc_log._HotPathLog(logger=hot_logger)
+
+
+def test_sampled_log_is_lazy():
+    hot_logger, handler = _hot_path_logger("sampled")
+    sampled = ssc_log.SampledLog(every=4, logger=hot_logger)
+    built = []
+
+    def message():
+        built.append(True)
+        return "built"
+
+    for index in range(10):
+        sampled.info(message)
+    assert handler.messages == ["built"] * 3
+    assert len(built) == 3
+
+    hot_logger.setLevel(logging.INFO)
+    sampled.debug(message)
+    assert len(built) == 3
+
+
+def test_deduplicated_log():
+    hot_logger, handler = _hot_path_logger("dedup")
+    deduplicated = ssc_log.DeduplicatedLog(logger=hot_logger)
+    for _ in range(5):
+        deduplicated.warning("link down on %s", "eth0")
+    deduplicated.warning("link up on %s", "eth0")
+    deduplicated.warning("link up on %s", "eth0")
+    deduplicated.flush()
+    assert handler.messages == [
+        "link down on eth0",
+        "Previous message repeated 4 more time(s)",
+        "link up on eth0",
+        "Previous message repeated 1 more time(s)",
+    ]
+
+
+def test_flight_recorder_dumps_on_error(tmp_path):
+    hot_logger, _ = _hot_path_logger("flight_recorder")
+    recorder = ssc_log.FlightRecorderHandler(capacity=5, directory=tmp_path)
+    hot_logger.addHandler(recorder)
+    for index in range(20):
+        hot_logger.debug("debug %d", index)
+    hot_logger.error("something broke")
+
+    (dump_path,) = tmp_path.iterdir()
+    lines = dump_path.read_text().splitlines()
+    assert lines[0] == "# Flight recorder dump (ERROR logged): last 5 record(s)"
+    assert [line.split("] ")[1] for line in lines[1:]] == [
+        "debug 16",
+        "debug 17",
+        "debug 18",
+        "debug 19",
+        "something broke",
+    ]
+
+    # Buffer is emptied by the dump
+    assert recorder.dump() is None
+    hot_logger.info("after")
+    assert recorder.dump().read_text().splitlines()[1].endswith("] after")
+
+
+def test_create_timestamped_file_never_reuses_a_name(tmp_path):
+    with freezegun.freeze_time("2025-01-02 03:45:56.123456"):
+        paths = []
+        for _ in range(3):
+            path, file = ssc_log._create_timestamped_file(tmp_path, prefix="dump")
+            file.close()
+            paths.append(path.name)
+    assert paths == [
+        "dump_2025-01-02T03_45_56.123.log",
+        "dump_2025-01-02T03_45_56.123_1.log",
+        "dump_2025-01-02T03_45_56.123_2.log",
+    ]
+
+
+def test_bounded_queue_handler_keeps_immutable_args():
+    handler = ssc_log.BoundedQueueHandler(maxsize=10)
+    record = logging.LogRecord("ssc", logging.INFO, __file__, 0, "sent %d bytes to %s", (12, "host"), None)
+    mutable = logging.LogRecord("ssc", logging.INFO, __file__, 0, "payload %s", ([1, 2],), None)
+    handler.handle(record)
+    handler.handle(mutable)
+    assert (record.msg, record.args) == ("sent %d bytes to %s", (12, "host"))
+    assert (mutable.msg, mutable.args) == ("payload [1, 2]", None)
+
+
+def test_flight_recorder_with_queued_logging(tmp_path):
+    log_path = tmp_path / "queued.log"
+    try:
+        ssc_log.init(
+            "INFO",
+            plain_text_file_path=log_path,
+            console_level="CRITICAL",
+            queued=True,
+            flight_recorder_size=100,
+            flight_recorder_directory=tmp_path / "recorder",
+        )
+        recorder = ssc_log._flight_recorder
+        assert recorder in ssc_log.logger.handlers
+        assert recorder not in ssc_log._queue_listener.handlers
+        assert ssc_log._queue_handler.level == logging.INFO
+
+        for index in range(50):
+            ssc_log.debug("debug %d", index)
+        ssc_log.info("info")
+        # DEBUG records skip the queue, and reach the recorder untouched
+        assert ssc_log.queue_stats()["enqueued"] == 1
+        assert recorder._take_records()[0].args == (0,)
+
+        # The dump is taken on this thread, but written on another
+        writers = []
+        write = recorder._write
+        recorder._write = lambda *args: writers.append(threading.current_thread()) or write(*args)
+        ssc_log.debug("before error")
+        ssc_log.error("error")
+        assert recorder._count == 0
+        recorder.flush()
+        assert writers and writers[0] is not threading.current_thread()
+        (dump_path,) = (tmp_path / "recorder").iterdir()
+        assert dump_path.read_text().splitlines()[1].endswith("] before error")
+    finally:
+        ssc_log.shutdown()
+        for handler in list(ssc_log.logger.handlers):
+            ssc_log.logger.removeHandler(handler)
+            if handler is not ssc_log.console_handler:
+                handler.close()
+        ssc_log._flight_recorder = None
+
+    assert "debug" not in log_path.read_text()
+
+
+def test_queued_reinit_with_lower_level():
+    original_level = ssc_log.logger.level
+    try:
+        ssc_log.init("INFO", queued=True)
+        assert ssc_log._queue_handler.level == logging.INFO
+        # The console handler is already behind the queue, and only its level changes
+        ssc_log.init("DEBUG", queued=True)
+        assert ssc_log._queue_handler.level == logging.DEBUG
+        ssc_log.debug("debug after re-init")
+        assert ssc_log.queue_stats()["enqueued"] == 1
+    finally:
+        ssc_log.shutdown()
+        for handler in list(ssc_log.logger.handlers):
+            ssc_log.logger.removeHandler(handler)
+            if handler is not ssc_log.console_handler:
+                handler.close()
+        ssc_log.logger.setLevel(original_level)
@@ -1,5 +1,8 @@
 import datetime
 
+import pytest
+
+from msu_ssc import path_util
 from msu_ssc import ssc_log
 
 timestamp_utc = datetime.datetime(2025, 1, 2, 3, 45, 56, 123456, tzinfo=datetime.timezone.utc)
@@ -46,6 +49,123 @@ def test_utc_filename_timestamp():
     pass
 
 
+def test_clean_path_part():
+    assert path_util.clean_path_part("already_clean-1.log") == "already_clean-1.log"
+    assert path_util.clean_path_part("a b::c/d") == "a_b_c_d"
+    assert path_util.clean_path_part("") == ""
+    assert path_util.clean_path_parts(["x y", "ok", "x y"]) == ["x_y", "ok", "x_y"]
+
+
+def test_file_timestamps_matches_file_timestamp():
+    timestamps = [
+        timestamp_utc,
+        timestamp_utc.replace(microsecond=0),
+        timestamp_utc + datetime.timedelta(microseconds=1),
+        timestamp_utc + datetime.timedelta(days=400, seconds=7),
+        timestamp_utc.astimezone(datetime.timezone(datetime.timedelta(hours=-5))),
+    ]
+    for timespec in ("auto", "hours", "minutes", "seconds", "milliseconds", "microseconds"):
+        for sep in ("T", " ", ":"):
+            expected = [path_util.file_timestamp(timestamp, sep=sep, timespec=timespec) for timestamp in timestamps]
+            assert path_util.file_timestamps(timestamps, sep=sep, timespec=timespec) == expected
+
+    assert path_util.file_timestamps([timestamp_naive], assume_utc=True) == ["2025-01-02T03_45_56"]
+
+
+def test_file_timestamps_epoch_nanoseconds():
+    nanoseconds = (timestamp_utc - datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)) // datetime.timedelta(
+        microseconds=1
+    ) * 1000 + 789
+    assert path_util.file_timestamps([nanoseconds], timespec="microseconds") == ["2025-01-02T03_45_56.123456"]
+
+
+def test_file_timestamps_numpy():
+    np = pytest.importorskip("numpy", reason="numpy is not installed, so the vectorised datetime64 path is untested")
+
+    timestamps = [timestamp_naive, timestamp_naive.replace(microsecond=0)]
+    array = np.array(timestamps, dtype="datetime64[ns]")
+    nanoseconds = array.astype(np.int64)
+    for timespec in ("auto", "hours", "minutes", "seconds", "milliseconds", "microseconds"):
+        expected = path_util.file_timestamps(timestamps, timespec=timespec, assume_utc=True)
+        assert path_util.file_timestamps(array, timespec=timespec) == expected
+        assert path_util.file_timestamps(nanoseconds, timespec=timespec) == expected
+        assert path_util.file_timestamps(nanoseconds.astype(np.uint64), timespec=timespec) == expected
+        assert path_util.file_timestamps(np.array(timestamps, dtype=object), timespec=timespec, assume_utc=True) == (
+            expected
+        )
+
+
+def test_partitioned_directory(tmp_path):
+    with path_util.PartitionedDirectory(tmp_path, prefix="capture ", suffix=".bin") as directory:
+        assert directory.partition(timestamp_utc) == tmp_path / "2025" / "002" / "03"
+
+        paths = [directory.path(timestamp_utc + datetime.timedelta(minutes=20 * index)) for index in range(6)]
+        assert paths[0] == tmp_path / "2025" / "002" / "03" / "capture_2025-01-02T03_45_56.bin"
+        assert paths[-1].parent == tmp_path / "2025" / "002" / "05"
+        for path in paths:
+            assert path.parent.is_dir()
+            path.touch()
+
+        # Partitions that were never written to are skipped
+        start = timestamp_utc - datetime.timedelta(days=1)
+        end = timestamp_utc + datetime.timedelta(days=1)
+        assert directory.partitions(start, end) == sorted({path.parent for path in paths})
+        assert directory.find(start, end) == paths
+        assert (
+            directory.find(
+                timestamp_utc + datetime.timedelta(minutes=20), timestamp_utc + datetime.timedelta(minutes=40)
+            )
+            == paths[1:3]
+        )
+
+    # A fresh instance finds the same files from the index files alone
+    reopened = path_util.PartitionedDirectory(tmp_path)
+    end_ns = path_util._epoch_nanoseconds(timestamp_utc + datetime.timedelta(minutes=20))
+    assert reopened.find(timestamp_utc, end_ns) == paths[:2]
+
+    with pytest.raises(ValueError):
+        reopened.partition(timestamp_naive)
+
+
+def test_partitioned_directory_recreates_deleted_partition(tmp_path):
+    import shutil
+
+    with path_util.PartitionedDirectory(tmp_path) as directory:
+        first = directory.path(timestamp_utc)
+        directory.path(timestamp_utc + datetime.timedelta(hours=1))
+        shutil.rmtree(first.parent)
+
+        again = directory.path(timestamp_utc + datetime.timedelta(seconds=1))
+        assert again.parent == first.parent
+        assert again.parent.is_dir()
+        assert directory.find(timestamp_utc, timestamp_utc + datetime.timedelta(minutes=1)) == [again]
+
+
+@pytest.mark.parametrize(
+    ("layout", "step"),
+    [
+        ("%Y/%j/%H", 60 * 60),
+        ("%Y/%j/%I%p", 60 * 60),
+        ("%Y/%j/%p", 60 * 60),
+        ("%Y/%m/%d/%R", 60),
+        ("%Y/%j/%T", 1),
+        ("%Y/%j", 24 * 60 * 60),
+        ("%Y-%m", 24 * 60 * 60),
+    ],
+)
+def test_partitioned_directory_layout_step(tmp_path, layout, step):
+    directory = path_util.PartitionedDirectory(tmp_path, layout=layout)
+    assert directory._step_seconds == step
+
+
+def test_partitioned_directory_twelve_hour_layout(tmp_path):
+    directory = path_util.PartitionedDirectory(tmp_path, layout="%Y/%j/%I%p")
+    morning = datetime.datetime(2025, 1, 2, 3, 0, 0, tzinfo=datetime.timezone.utc)
+    assert directory.partition(morning) == tmp_path / "2025" / "002" / "03AM"
+    assert directory.partition(morning + datetime.timedelta(hours=5)) == tmp_path / "2025" / "002" / "08AM"
+    assert directory.partition(morning + datetime.timedelta(hours=10)) == tmp_path / "2025" / "002" / "01PM"
+
+
 if __name__ == "__main__":
     # pytest.main([__file__])
     pass
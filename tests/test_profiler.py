@@ -0,0 +1,138 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from msu_ssc import profiler
+
+
+def _busy_work(stop_event: threading.Event) -> None:
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop_event = threading.Event()
+    thread = threading.Thread(name="udp-mux-test", target=_busy_work, args=(stop_event,), daemon=True)
+    thread.start()
+    yield thread
+    stop_event.set()
+    thread.join()
+
+
+def _read_collapsed(path):
+    stacks = {}
+    for line in path.read_text().splitlines():
+        stack, _, count = line.rpartition(" ")
+        stacks[stack] = int(count)
+    return stacks
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _count_samples(sampler) -> list:
+    """Count the samples `sampler` takes, in a list whose length is the count."""
+    samples = []
+    sample = sampler.sample
+
+    def counting_sample(*args):
+        samples.append(None)
+        sample(*args)
+
+    sampler.sample = counting_sample
+    return samples
+
+
+def test_sampling_profiler_window(tmp_path, busy_thread):
+    sampler = profiler.SamplingProfiler(directory=tmp_path, interval=0.001, thread_name_prefixes=["udp-mux"])
+    assert not sampler.running
+    assert sampler.start(duration=0.2)
+    assert not sampler.start()
+    _wait_for(lambda: not sampler.running)
+
+    path = sampler.last_path
+    assert path.parent == tmp_path and path.suffix == ".collapsed"
+    stacks = _read_collapsed(path)
+    assert sum(stacks.values()) > 10
+    for stack in stacks:
+        frames = stack.split(";")
+        assert frames[0] == "udp-mux-test"
+        assert any(frame.startswith("_busy_work (test_profiler.py:") for frame in frames)
+
+
+def test_sampling_profiler_stop(tmp_path, busy_thread):
+    sampler = profiler.SamplingProfiler(directory=tmp_path, interval=0.001, duration=None)
+    assert sampler.stop() is None
+    samples = _count_samples(sampler)
+    sampler.start()
+    _wait_for(lambda: len(samples) >= 10)
+    path = sampler.stop()
+    assert not sampler.running
+    threads = {stack.split(";")[0] for stack in _read_collapsed(path)}
+    assert "udp-mux-test" in threads
+    assert "sampling-profiler" not in threads
+
+
+def test_control_socket(tmp_path, monkeypatch, busy_thread):
+    monkeypatch.setattr(profiler, "profiler", profiler.SamplingProfiler(directory=tmp_path, interval=0.001))
+    samples = _count_samples(profiler.profiler)
+    control_socket = profiler.serve_control_socket(("127.0.0.1", 0))
+    address = control_socket.getsockname()
+    try:
+        assert profiler.send_command("status", address, timeout=5).startswith("running: False")
+        assert profiler.send_command("stop", address, timeout=5) == "not running"
+        assert profiler.send_command("start 60", address, timeout=5) == "started"
+        assert profiler.send_command("start", address, timeout=5) == "already running"
+        _wait_for(lambda: len(samples) >= 10)
+        reply = profiler.send_command("stop", address, timeout=5)
+        assert reply == f"stopped: {profiler.profiler.last_path}"
+        # Not the profile just written, again
+        assert profiler.send_command("stop", address, timeout=5) == "not running"
+        assert profiler.send_command("start soon", address, timeout=5).startswith("error")
+        assert profiler.send_command("explode", address, timeout=5).startswith("error")
+    finally:
+        control_socket.close()
+
+
+def test_shared_profiler_samples_mux_and_proxy_threads():
+    from msu_ssc.udp_proxy import OneWayUdpProxyThread
+
+    assert profiler.profiler.thread_name_prefixes == profiler.MUX_PROXY_THREAD_PREFIXES
+    proxy_thread = OneWayUdpProxyThread(
+        source_tup=("127.0.0.1", 8000),
+        destination_tup=("127.0.0.1", 8001),
+        proxy_tup=("127.0.0.1", 9001),
+        name="client_to_server",
+    )
+    proxy_thread.proxy_socket.close()
+    assert proxy_thread.name == "udp-proxy-client_to_server(127.0.0.1:9001->127.0.0.1:8001)"
+    assert proxy_thread.name.startswith(profiler.MUX_PROXY_THREAD_PREFIXES)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="No SIGUSR1 on this platform")
+def test_signal_handler(tmp_path, monkeypatch, busy_thread):
+    monkeypatch.setattr(profiler, "profiler", profiler.SamplingProfiler(directory=tmp_path, interval=0.001))
+    samples = _count_samples(profiler.profiler)
+    previous = signal.getsignal(signal.SIGUSR1)
+    profiler.install_signal_handler()
+    try:
+        # The toggling happens on another thread, so the handler can't deadlock on the profiler's lock
+        with profiler.profiler._lock:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            time.sleep(0.05)
+            assert not profiler.profiler.running
+        _wait_for(lambda: profiler.profiler.running)
+        _wait_for(lambda: len(samples) >= 10)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        _wait_for(lambda: not profiler.profiler.running)
+        assert profiler.profiler.last_path.exists()
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
@@ -0,0 +1,56 @@
+import pytest
+
+from msu_ssc import prompt_util
+
+
+def test_parse_selection():
+    assert prompt_util.parse_selection("1-3,5 7", 10) == {0, 1, 2, 4, 6}
+    assert prompt_util.parse_selection(" 2, 2 ,1-2 ", 10) == {0, 1}
+    assert prompt_util.parse_selection("", 10) == set()
+    assert len(prompt_util.parse_selection("1-250,400", 1000)) == 251
+    for bad in ("0", "11", "3-1", "x", "-2", "1-"):
+        with pytest.raises(ValueError):
+            prompt_util.parse_selection(bad, 10)
+
+
+def test_choice_index_filter():
+    index = prompt_util.ChoiceIndex(["GS2_pass_001.bin", "gs2_pass_002.log", "GS3_pass_003.bin", 4])
+    assert index.labels[3] == "4"
+    assert list(index.filter("")) == [0, 1, 2, 3]
+    assert index.filter("gs2") == [0, 1]
+    assert index.filter("gs2_pass_00") == [0, 1]
+    assert index.filter("gs2_pass_002") == [1]
+    assert index.filter("bin") == [0, 2]
+    assert index.filter("g2bn", fuzzy=True) == [0]
+    assert index.filter("gpb", fuzzy=True) == [0, 2]
+    assert index.render([1, 3], selected={3}) == "  2. gs2_pass_002.log\n *4. 4"
+
+
+def _answer(monkeypatch, answers):
+    answers = iter(answers)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+
+def test_get_user_choices_pages_and_filters(monkeypatch, capsys):
+    choices = [f"pass_{number:04d}" for number in range(1, 1001)]
+    _answer(monkeypatch, ["n", "/pass_09", "all", "y"])
+    result = prompt_util.get_user_choices(choices, page_size=10)
+    assert result == choices[899:999]
+
+    output = capsys.readouterr().out
+    # Only pages are printed, never the whole list
+    assert output.count("pass_") < 100
+    assert "pass_0011" in output and "pass_0021" not in output
+    assert "Page 2/100" in output and "100 of 1000 choices" in output
+
+
+def test_get_user_choices_ranges(monkeypatch):
+    choices = list("ABCDEFGHIJ")
+    _answer(monkeypatch, ["2-4,9"])
+    assert prompt_util.get_user_choices(choices, verify=False) == ["B", "C", "D", "I"]
+
+    _answer(monkeypatch, ["1-2", "0", "3"])
+    assert prompt_util.get_user_choice_single(choices, verify=False) == "C"
+
+    with pytest.raises(ValueError):
+        prompt_util.get_user_choices(choices, page_size=0)
@@ -0,0 +1,92 @@
+import datetime
+import io
+import json
+import logging
+
+from msu_ssc import ssc_log_binary
+
+base_time = datetime.datetime(2025, 1, 2, 3, 0, 0, tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _write_log(path, count=600, **kwargs):
+    handler = ssc_log_binary.BinaryLogHandler(path, checkpoint_interval=10, **kwargs)
+    handler._start_segment(base_time)
+    test_logger = logging.getLogger("ssc.test_binary")
+    try:
+        for index in range(count):
+            record = test_logger.makeRecord(
+                test_logger.name, logging.INFO, __file__, index, "packet %d from %s", (index, "127.0.0.1:8001"), None
+            )
+            record.created = base_time + index
+            handler.handle(record)
+        record = test_logger.makeRecord(test_logger.name, logging.DEBUG, __file__, 1, "plain f-string é", None, None)
+        record.created = base_time + count
+        handler.handle(record)
+    finally:
+        handler.close()
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "ssc.sscb"
+    _write_log(path)
+
+    records = list(ssc_log_binary.read_records(path))
+    assert len(records) == 601
+    assert records[5].message == "packet 5 from 127.0.0.1:8001"
+    assert records[5].name == "ssc.test_binary"
+    assert records[5].levelname == "INFO"
+    assert records[5].lineno == 5
+    assert records[5].created == base_time + 5
+    assert records[-1].message == "plain f-string é"
+    assert len(ssc_log_binary.read_index(path)) == 61
+
+
+def test_time_range_uses_index(tmp_path):
+    path = tmp_path / "ssc.sscb"
+    _write_log(path)
+
+    start = datetime.datetime.fromtimestamp(base_time + 300, tz=datetime.timezone.utc)
+    end = datetime.datetime.fromtimestamp(base_time + 310, tz=datetime.timezone.utc)
+    records = list(ssc_log_binary.read_records(path, start=start, end=end))
+    assert [record.lineno for record in records] == list(range(300, 310))
+
+
+def test_export_jsonl(tmp_path):
+    path = tmp_path / "ssc.sscb"
+    _write_log(path, count=3)
+
+    output = io.StringIO()
+    assert ssc_log_binary.export_jsonl(path, output) == 4
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[0]["message"] == "packet 0 from 127.0.0.1:8001"
+    assert lines[0]["timestamp"] == "2025-01-02T03:00:00+00:00"
+
+
+def test_rotation(tmp_path):
+    path = tmp_path / "ssc.sscb"
+    _write_log(path, rotate_interval=datetime.timedelta(minutes=1), compression="gzip")
+
+    segments = sorted(tmp_path.glob("ssc_*.sscb.gz"))
+    assert len(segments) == 10
+    assert segments[0].name == "ssc_2025-01-02T03_00_00.sscb.gz"
+    assert sorted(tmp_path.glob("ssc_*.sscb.idx")) == [ssc_log_binary.index_path(segment) for segment in segments]
+
+    # Every segment is a complete log with its own index
+    records = [record for segment in segments + [path] for record in ssc_log_binary.read_records(segment)]
+    assert [record.lineno for record in records[:600]] == list(range(600))
+    assert records[-1].message == "plain f-string é"
+    assert len(ssc_log_binary.read_index(segments[3])) == 6
+    window = list(ssc_log_binary.read_records(segments[3], start=base_time + 200, end=base_time + 205))
+    assert [record.lineno for record in window] == [200, 201, 202, 203, 204]
+
+
+def test_rotation_retention_removes_indexes(tmp_path):
+    path = tmp_path / "ssc.sscb"
+    _write_log(path, rotate_bytes=2_000, retention_bytes=5_000)
+
+    segments = sorted(tmp_path.glob("ssc_*.sscb"))
+    assert 1 <= len(segments) <= 3
+    assert sorted(tmp_path.glob("ssc_*.sscb.idx")) == [ssc_log_binary.index_path(segment) for segment in segments]
+    # Only the newest records are left
+    assert list(ssc_log_binary.read_records(path))[-1].message == "plain f-string é"
+    assert list(ssc_log_binary.read_records(segments[0]))[0].lineno > 500
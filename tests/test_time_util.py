@@ -0,0 +1,87 @@
+import datetime
+import time
+
+import pytest
+
+from msu_ssc import time_util
+
+
+def test_ns_to_utc():
+    assert time_util.ns_to_utc(0) == datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    assert time_util.ns_to_utc(1_735_787_156_123_456_789) == datetime.datetime(
+        2025, 1, 2, 3, 5, 56, 123456, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_monotonic_clock_tracks_wall_clock():
+    clock = time_util.MonotonicClock()
+    assert abs(clock.time_ns() - time.time_ns()) < 50_000_000
+    assert abs(clock.time() - time.time()) < 0.05
+    assert abs((clock.utc() - time_util.utc()).total_seconds()) < 0.05
+    assert abs(time_util.utc_ns() - time.time_ns()) < 50_000_000
+
+
+def test_monotonic_clock_slews_without_jumping(monkeypatch):
+    clock = time_util.MonotonicClock(reanchor_interval=10.0, max_correction=0.001)
+    real_time_ns = time.time_ns
+
+    # Step the system clock back by a whole second, like an NTP step
+    monkeypatch.setattr(time, "time_ns", lambda: real_time_ns() - 1_000_000_000)
+    before = clock.time_ns()
+    drift_ns = clock.reanchor()
+    assert -1_010_000_000 < drift_ns < -990_000_000
+    assert clock._anchor[2] == -1_000_000
+
+    # Never backwards, and not stepped
+    readings = [clock.time_ns() for _ in range(1000)]
+    assert readings == sorted(readings)
+    assert readings[0] >= before
+    assert readings[-1] - before < 50_000_000
+
+
+class _FakeClocks:
+    def __init__(self):
+        self.monotonic_ns = 1_000_000_000_000
+        self.wall_offset_ns = 1_735_787_156_000_000_000
+
+    def wall_ns(self):
+        return self.monotonic_ns + self.wall_offset_ns
+
+
+def test_monotonic_clock_idle_gap(monkeypatch):
+    fake = _FakeClocks()
+    monkeypatch.setattr(time_util, "_monotonic_ns", lambda: fake.monotonic_ns)
+    monkeypatch.setattr(time, "time_ns", fake.wall_ns)
+    interval_ns = 60_000_000_000
+    clock = time_util.MonotonicClock(reanchor_interval=60.0, max_correction=0.01)
+    assert clock.time_ns() == fake.wall_ns()
+
+    # An NTP step back by 1 second, seen at the next re-anchor
+    fake.wall_offset_ns -= 1_000_000_000
+    fake.monotonic_ns += interval_ns
+    clock.time_ns()
+    assert clock.drift_ns == -1_000_000_000
+
+    # Then nothing reads the clock for a day: only one interval's worth of correction is applied
+    fake.monotonic_ns += 24 * 3600 * 1_000_000_000
+    assert clock.time_ns() - fake.wall_ns() == 1_000_000_000 - 10_000_000
+    assert clock.drift_ns == -(1_000_000_000 - 10_000_000)
+
+    # And it converges at 10 ms per interval, without going backwards
+    previous = clock.time_ns()
+    for _ in range(4 * 100):
+        fake.monotonic_ns += interval_ns // 4
+        now = clock.time_ns()
+        assert now > previous
+        previous = now
+    assert abs(clock.time_ns() - fake.wall_ns()) <= 10_000_000 * 2
+
+    # Or it can be stepped
+    fake.wall_offset_ns += 5_000_000_000
+    clock.reanchor(step=True)
+    assert clock.time_ns() == fake.wall_ns()
+
+
+def test_monotonic_clock_arguments():
+    with pytest.raises(ValueError):
+        time_util.MonotonicClock(reanchor_interval=1.0, max_correction=1.0)